@@ -1,10 +1,30 @@
-from flask import Flask, render_template_string, request, redirect, jsonify, make_response, url_for
-from datetime import date, datetime, timedelta
-import calendar, json, time
+from flask import Flask, render_template, request, redirect, jsonify, make_response, url_for, stream_with_context
+from flask import g, has_request_context, before_render_template, template_rendered, send_from_directory
+from jinja2 import DictLoader, FileSystemBytecodeCache
+from datetime import date, timedelta
+import bisect, contextvars, hashlib, json, os, sqlite3, time, threading
 from pathlib import Path
-from werkzeug.security import generate_password_hash, check_password_hash
-import jwt  # PyJWT
+from urllib.parse import quote
 from functools import wraps
+from contextlib import contextmanager
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+import base64, itertools
+import io, types
+import random, re, sys
+from collections import Counter, deque
+from array import array
+import click
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes
+    fcntl = None
+# Imported where they are used, so a cold start doesn't pay for them before
+# the first request that needs them: jwt (PyJWT), werkzeug.security,
+# calendar, gzip (archive), csv/zipfile (export), concurrent.futures.process (report),
+# cProfile (profiling), asyncio (ASGI mode) and numpy (optional, stats - see load_numpy()).
+np = None
 
 # ---------------------------
 # CONFIG
@@ -14,30 +34,1658 @@ app.config["SECRET_KEY"] = "change-me-to-a-secure-random-string"  # <<-- change
 JWT_ALGORITHM = "HS256"
 JWT_EXP_SECONDS = 24 * 3600  # 24 hours
 RESET_EXP_SECONDS = 15 * 60  # 15 minutes for password reset tokens
-DATA_FILE = Path("/tmp/attendance.json")
+DATA_FILE = Path(os.environ.get("ATTENDANCE_DATA_FILE", "/tmp/attendance.json"))
+# "json": rewrite DATA_FILE on every save; "log": append-only op log + snapshot;
+# "sqlite": rows in SQLITE_FILE (see `flask migrate-sqlite` to import DATA_FILE);
+# "sharded": users hashed over SHARD_BUCKETS JSON files in SHARD_DIR plus a
+# manifest (`flask migrate-shards` imports DATA_FILE)
+STORAGE_BACKEND = os.environ.get("ATTENDANCE_BACKEND", "json")
+SQLITE_FILE = Path(os.environ.get("ATTENDANCE_SQLITE_FILE", "/tmp/attendance.db"))
+SHARD_DIR = Path(os.environ.get("ATTENDANCE_SHARD_DIR", "/tmp/attendance-shards"))
+SHARD_BUCKETS = int(os.environ.get("ATTENDANCE_SHARD_BUCKETS", 64))  # fixed once the directory exists
+# cold history, off unless ATTENDANCE_ARCHIVE_DIR is set: `flask archive`
+# moves cycles that closed ARCHIVE_AFTER_MONTHS or more ago into gzip'd
+# per-user, per-year segments there, which are read-only from then on
+ARCHIVE_DIR = os.environ.get("ATTENDANCE_ARCHIVE_DIR")
+ARCHIVE_AFTER_MONTHS = int(os.environ.get("ATTENDANCE_ARCHIVE_AFTER_MONTHS", 24))
+ARCHIVE_CACHE_SIZE = 256  # decoded segments kept in memory per worker
+ARCHIVE_BATCH = 20000     # hot records deleted per commit once archived
+# change log behind /api/changes, off unless ATTENDANCE_CHANGES_LOG=1: each
+# store keeps it beside its data (a table in SQLITE_FILE, <file>.changes.db
+# next to the JSON data file or each bucket) and enters a write in it
+# before publishing it. Only the latest change per record is kept, and
+# changes older than CHANGES_KEEP_DAYS are dropped (checked every
+# CHANGES_TRIM_EVERY writes per worker); clients further behind resync.
+# Writes made while it is off are not logged: clients reload after turning
+# it back on
+CHANGES_LOG = os.environ.get("ATTENDANCE_CHANGES_LOG") == "1"
+CHANGES_KEEP_DAYS = float(os.environ.get("ATTENDANCE_CHANGES_KEEP_DAYS", 30))
+CHANGES_TRIM_EVERY = 1000
+AUTH_CACHE_SIZE = 10000  # verified session tokens kept in memory per worker
+AUTH_CACHE_TTL = 300     # seconds before a cached token is re-verified
+# password hashing: method/cost for new hashes (older ones are upgraded on
+# login), KDF worker threads and how many more hashes may wait for one
+PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+KDF_WORKERS = int(os.environ.get("KDF_WORKERS", 2))
+KDF_MAX_QUEUE = int(os.environ.get("KDF_MAX_QUEUE", 16))
+# login throttling token buckets: (burst, seconds per refilled attempt)
+LOGIN_LIMIT_PER_USER = (5, 30)
+LOGIN_LIMIT_PER_IP = (20, 3)
+# reverse proxies in front of the app that set X-Forwarded-For/-Proto
+# (1 on Vercel); 0 = clients connect directly and the header is ignored
+PROXY_HOPS = int(os.environ.get("ATTENDANCE_PROXY_HOPS", 0))
+USERS_PAGE_SIZE = 100  # default / max page size for /api/admin/users
+USERS_PAGE_MAX = 1000
+CHANGES_PAGE_SIZE = 1000  # default / max changes per /api/changes response
+CHANGES_PAGE_MAX = 5000
+# org-wide report: worker processes for `flask report` (/api/admin/report
+# always aggregates inside the web worker; a pool per request costs more
+# than it saves and forks the server)
+REPORT_WORKERS = int(os.environ.get("ATTENDANCE_REPORT_WORKERS", os.cpu_count() or 1))
+# optional on-disk cache for compiled Jinja templates, e.g. /tmp/jinja-cache
+TEMPLATE_BYTECODE_DIR = os.environ.get("TEMPLATE_BYTECODE_DIR")
+LOG_COMPACT_EVERY = int(os.environ.get("ATTENDANCE_LOG_COMPACT_EVERY", 1000))
+# request metrics (/metrics): requests slower than this are logged, and
+# ATTENDANCE_SERVER_TIMING=1 adds a Server-Timing header with the phase split
+SLOW_REQUEST_MS = float(os.environ.get("ATTENDANCE_SLOW_REQUEST_MS", 500))
+SERVER_TIMING = os.environ.get("ATTENDANCE_SERVER_TIMING") == "1"
+# per-request profiling, off unless ATTENDANCE_PROFILE_DIR is set: admins
+# ask for it with an X-Profile: 1 header or ?_profile=1, and a share of all
+# requests can be sampled (ATTENDANCE_PROFILE_RATE, e.g. 0.01)
+PROFILE_DIR = os.environ.get("ATTENDANCE_PROFILE_DIR")
+PROFILE_RATE = float(os.environ.get("ATTENDANCE_PROFILE_RATE", 0))
+PROFILE_INTERVAL = 0.001  # stack sampling period, seconds
+PROFILE_KEEP = 200        # newest profiles kept on disk
+# live admin feed (/api/admin/events, server-sent events): events a listener
+# may fall behind by before it is dropped, and listeners per worker
+EVENTS_QUEUE_SIZE = int(os.environ.get("ATTENDANCE_EVENTS_QUEUE", 256))
+EVENTS_MAX_LISTENERS = int(os.environ.get("ATTENDANCE_EVENTS_MAX_LISTENERS", 50))
+EVENTS_HEARTBEAT = 15  # seconds between keepalive comments
+# ASGI mode (`uvicorn --app-dir api app:asgi_app`): threads that run the
+# route handlers; connections themselves are held by the event loop
+ASGI_THREADS = int(os.environ.get("ATTENDANCE_ASGI_THREADS", 32))
 
 # ---------------------------
-# Storage (Vercel-safe) - initialize if missing
+# Request phase timing (storage / auth / kdf / render), see /metrics
+# ---------------------------
+@contextmanager
+def phase(name):
+    """Add the block's wall time to the current request's `name` phase."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context() and "phases" in g:
+            g.phases[name] = g.phases.get(name, 0.0) + time.perf_counter() - t0
+
+def _timed_iter(gen, name):
+    # lazy store results (iter_users) are timed a step at a time
+    while True:
+        with phase(name):
+            try:
+                item = next(gen)
+            except StopIteration:
+                return
+        yield item
+
+class TimedStore:
+    """Proxy that times every public store call into the "storage" phase.
+    The store itself is only opened (files, SQLite schema) on first use."""
+
+    def __init__(self, open_inner):
+        self._open_inner = open_inner
+        self._inner = None
+        self._open_lock = threading.Lock()
+
+    def _get_inner(self):
+        if self._inner is None:
+            with self._open_lock:
+                if self._inner is None:
+                    self._inner = self._open_inner()
+        return self._inner
+
+    def __getattr__(self, name):
+        attr = getattr(self._get_inner(), name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        @wraps(attr)
+        def timed(*args, **kwargs):
+            with phase("storage"):
+                result = attr(*args, **kwargs)
+            if isinstance(result, types.GeneratorType):
+                return _timed_iter(result, "storage")
+            return result
+        setattr(self, name, timed)  # later lookups skip __getattr__
+        return timed
+
+# ---------------------------
+# Storage (Vercel-safe) - the data file is created on the first write
 # File structure:
 # { "alice": { "name": "...", "password": "<hash>", "is_admin": false,
 #              "attendance": {...}, "reset_token": {"token": "...", "exp": 123456} } }
 # ---------------------------
-if not DATA_FILE.exists():
-    DATA_FILE.write_text(json.dumps({}, indent=2))
+def atomic_write(path, data):
+    """Write bytes/str to `path` via a temp file + fsync + os.replace, so
+    readers see either the old file or the new one, never a partial one."""
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data.encode() if isinstance(data, str) else data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
 
-def read_data():
+def file_stamp(path):
+    """(inode, mtime, size) of `path`, or None if it doesn't exist.
+    atomic_write() swaps in a new inode, so this changes on every publish
+    even when mtime resolution is coarse."""
     try:
-        return json.loads(DATA_FILE.read_text())
-    except Exception:
-        return {}
+        st = Path(path).stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+def apply_op(data, op):
+    """Apply one mutation record to the in-memory user dict.
+
+    Ops are plain dicts so they can be written straight to the log:
+      {"op": "put_user", "user": u, "value": {...}}
+      {"op": "del_user", "user": u}
+      {"op": "update_user", "user": u, "fields": {...}}
+      {"op": "put_day",  "user": u, "day": iso, "value": {...}}
+      {"op": "del_day",  "user": u, "day": iso}
+    A put_user value without an "attendance" key keeps the user's existing
+    records; update_user sets only the given fields (None removes one) and
+    never touches records. Stores stamp each op with a "rev" when committing
+    it; the touched user's "rev" field is set to it. Replaying the same op
+    twice is harmless. A del_day marked "archived" moves the record to cold
+    storage rather than deleting it (see change_entry()).
+    """
+    kind, user = op["op"], op["user"]
+    if kind == "put_user":
+        value = op["value"]
+        if "attendance" in value:
+            attendance = value["attendance"]
+            if not isinstance(attendance, PackedAttendance):
+                attendance = PackedAttendance(attendance)
+        else:
+            attendance = (data.get(user) or {}).get("attendance") or PackedAttendance()
+        data[user] = dict(value, attendance=attendance)
+    elif kind == "del_user":
+        data.pop(user, None)
+    elif kind == "update_user":
+        if user in data:
+            user_obj = data[user] = dict(data[user])
+            for key, value in op["fields"].items():
+                if value is None:
+                    user_obj.pop(key, None)
+                elif key != "attendance":
+                    user_obj[key] = value
+    elif kind == "put_day":
+        user_obj = data.get(user)
+        if user_obj is not None:
+            user_obj.setdefault("attendance", PackedAttendance())[op["day"]] = op["value"]
+    elif kind == "del_day":
+        (data.get(user) or {}).get("attendance", {}).pop(op["day"], None)
+    if "rev" in op and user in data:
+        data[user]["rev"] = op["rev"]
+
+def change_entry(data, op):
+    """The (username, day, deleted) change `op` makes to a record in `data`
+    (day None: the user was deleted, and with it all of its records), or
+    None. Call it before applying the op."""
+    kind, user = op["op"], op["user"]
+    if user not in data or op.get("archived"):
+        return None
+    if kind == "put_day":
+        return user, op["day"], False
+    if kind == "del_day" and op["day"] in data[user].get("attendance", {}):
+        return user, op["day"], True
+    if kind == "del_user":
+        return user, None, True
+    return None
+
+def next_rev(last):
+    """Revision for the next commit: strictly increasing and time based, so
+    a user that is deleted and re-created never reuses an old revision."""
+    return max(last + 1, time.time_ns() // 1000)
+
+# ---------------------------
+# Attendance cycles (26th of previous month -> 25th) and their totals
+# ---------------------------
+def cycle_bounds(year, month):
+    if month == 1:
+        prev_month, prev_year = 12, year - 1
+    else:
+        prev_month, prev_year = month - 1, year
+    return date(prev_year, prev_month, 26), date(year, month, 25)
+
+def cycle_of(day_iso):
+    """(year, month) of the cycle containing a canonical YYYY-MM-DD key,
+    else None (fromisoformat alone also takes "20260105" or "2026-W02-1")."""
+    try:
+        d = date.fromisoformat(day_iso)
+    except (TypeError, ValueError):
+        return None
+    if d.isoformat() != day_iso:
+        return None
+    if d.day < 26:
+        return d.year, d.month
+    return (d.year + 1, 1) if d.month == 12 else (d.year, d.month + 1)
+
+def add_cycles(cyc, n):
+    """The cycle `n` cycles after (n < 0: before) the (year, month) `cyc`."""
+    k = cyc[0] * 12 + cyc[1] - 1 + n
+    return k // 12, k % 12 + 1
+
+def empty_totals():
+    return {"present": 0, "absent": 0, "ot_hours": 0.0, "shifts": {}}
+
+def add_to_totals(totals, day_iso, rec, sign=1):
+    """Add (sign=1) or remove (sign=-1) one record's contribution."""
+    status = rec.get("status", "")
+    if status == "Present":
+        totals["present"] += sign
+        try:
+            totals["ot_hours"] += sign * float(rec.get("ot_hours", 0) or 0)
+        except Exception:
+            pass
+    elif status == "Absent":
+        totals["absent"] += sign
+    sh = (rec.get("shift") or "").strip()
+    if status == "Present" and sh and sh != "GEN":
+        day = date.fromisoformat(day_iso).day
+        days = totals["shifts"].setdefault(sh, [])
+        if sign > 0:
+            days.append(day)
+        elif day in days:
+            days.remove(day)
+            if not days:
+                del totals["shifts"][sh]
+
+def copy_totals(totals):
+    return dict(totals, shifts={k: list(v) for k, v in totals["shifts"].items()})
+
+# ---------------------------
+# Attendance records, packed per user for the in-memory stores
+# ---------------------------
+SHIFTS = ["GEN", "FS", "SS", "NS", "GEN2"]
+STATUSES = ["Present", "Absent"]
+# small-int codes for compact/columnar records; 0 = missing or unknown
+SHIFT_CODES = {s: i for i, s in enumerate(SHIFTS, 1)}
+STATUS_CODES = {s: i for i, s in enumerate(STATUSES, 1)}
+RECORD_KEYS = {"shift", "status", "ot_hours"}
+# packed code (shift_code * 3 + status_code) -> (shift, status)
+RECORD_FIELDS = [(shift, status) for shift in [None] + SHIFTS for status in [None] + STATUSES]
+_iso_days = {}  # date ordinal -> "YYYY-MM-DD", bounded by the distinct days stored
+
+def ordinal_iso(ordinal):
+    iso = _iso_days.get(ordinal)
+    if iso is None:
+        iso = _iso_days[ordinal] = date.fromordinal(ordinal).isoformat()
+    return iso
+
+def day_ordinal(day_iso):
+    """date ordinal of a canonical YYYY-MM-DD key, else None."""
+    try:
+        d = date.fromisoformat(day_iso)
+    except (TypeError, ValueError):
+        return None
+    return d.toordinal() if d.isoformat() == day_iso else None
+
+class PackedAttendance(MutableMapping):
+    """One user's {day_iso: {"shift", "status", "ot_hours"}} records as
+    three parallel arrays sorted by day: the date ordinal (int32), one byte
+    holding the shift and status codes, and OT hours (float64, so values
+    round-trip exactly). That is 13 bytes per record instead of a dict, its
+    key string and a float object (~300 bytes).
+
+    Reads hand out a fresh record dict. Anything that does not fit the
+    packed form exactly - a non-canonical day key, an unknown shift or
+    status string, extra fields, a non-float ot_hours - is kept as given in
+    a small side dict, so the JSON written back is what was read.
+    """
+
+    __slots__ = ("_days", "_codes", "_ot", "_odd")
+
+    def __init__(self, records=None):
+        self._days, self._codes, self._ot, self._odd = array("i"), bytearray(), array("d"), {}
+        packed = []
+        for day, rec in (records or {}).items():
+            code, ordinal = self._pack(rec), day_ordinal(day)
+            if code is None or ordinal is None:
+                self._odd[day] = rec
+            else:
+                packed.append((ordinal, code, rec["ot_hours"]))
+        packed.sort()
+        for ordinal, code, ot in packed:
+            if self._days and self._days[-1] == ordinal:  # "2026-1-5" vs canonical dup
+                self._codes[-1], self._ot[-1] = code, ot
+                continue
+            self._days.append(ordinal)
+            self._codes.append(code)
+            self._ot.append(ot)
+
+    @staticmethod
+    def _pack(rec):
+        if type(rec) is not dict or rec.keys() != RECORD_KEYS or type(rec["ot_hours"]) is not float:
+            return None
+        shift, status = rec["shift"], rec["status"]
+        shift_code = 0 if shift is None else SHIFT_CODES.get(shift)
+        status_code = 0 if status is None else STATUS_CODES.get(status)
+        if shift_code is None or status_code is None:
+            return None
+        return shift_code * 3 + status_code
+
+    def _record(self, i):
+        shift, status = RECORD_FIELDS[self._codes[i]]
+        return {"shift": shift, "status": status, "ot_hours": self._ot[i]}
+
+    def _find(self, day_iso):
+        ordinal = day_ordinal(day_iso)
+        if ordinal is None:
+            return None, -1
+        i = bisect.bisect_left(self._days, ordinal)
+        return ordinal, (i if i < len(self._days) and self._days[i] == ordinal else -1)
+
+    def __getitem__(self, day_iso):
+        if day_iso in self._odd:
+            return self._odd[day_iso]
+        _, i = self._find(day_iso)
+        if i < 0:
+            raise KeyError(day_iso)
+        return self._record(i)
+
+    def __setitem__(self, day_iso, rec):
+        ordinal, i = self._find(day_iso)
+        code = self._pack(rec)
+        if code is None or ordinal is None:
+            if i >= 0:
+                del self._days[i], self._codes[i], self._ot[i]
+            self._odd[day_iso] = rec
+            return
+        self._odd.pop(day_iso, None)
+        if i >= 0:
+            self._codes[i], self._ot[i] = code, rec["ot_hours"]
+        else:
+            i = bisect.bisect_left(self._days, ordinal)
+            self._days.insert(i, ordinal)
+            self._codes.insert(i, code)
+            self._ot.insert(i, rec["ot_hours"])
+
+    def __delitem__(self, day_iso):
+        if self._odd.pop(day_iso, None) is not None:
+            return
+        _, i = self._find(day_iso)
+        if i < 0:
+            raise KeyError(day_iso)
+        del self._days[i], self._codes[i], self._ot[i]
+
+    def __iter__(self):
+        for ordinal in self._days:
+            yield ordinal_iso(ordinal)
+        yield from self._odd
+
+    def __len__(self):
+        return len(self._days) + len(self._odd)
+
+    def _bounds(self, start_iso, end_iso):
+        return (bisect.bisect_left(self._days, date.fromisoformat(start_iso).toordinal()),
+                bisect.bisect_right(self._days, date.fromisoformat(end_iso).toordinal()))
+
+    def range(self, start_iso, end_iso):
+        """{day: record} for start_iso <= day <= end_iso, via bisect."""
+        lo, hi = self._bounds(start_iso, end_iso)
+        out = {ordinal_iso(self._days[i]): self._record(i) for i in range(lo, hi)}
+        out.update((d, r) for d, r in self._odd.items() if start_iso <= d <= end_iso)
+        return out
+
+    def slice(self, start_iso, end_iso):
+        """The same records as range(), as a PackedAttendance: the arrays
+        are sliced in C and no record dict is built."""
+        lo, hi = self._bounds(start_iso, end_iso)
+        out = PackedAttendance()
+        out._days, out._codes, out._ot = self._days[lo:hi], self._codes[lo:hi], self._ot[lo:hi]
+        out._odd = {d: r for d, r in self._odd.items() if start_iso <= d <= end_iso}
+        return out
+
+    def arrays(self):
+        """(day ordinals, packed codes, OT hours, {day: record} of the rest):
+        the live containers, for readers that copy them straight out."""
+        return self._days, self._codes, self._ot, self._odd
+
+    def to_dict(self):
+        fields = RECORD_FIELDS
+        out = {ordinal_iso(o): {"shift": fields[c][0], "status": fields[c][1], "ot_hours": ot}
+               for o, c, ot in zip(self._days, self._codes, self._ot)}
+        out.update(self._odd)
+        return out
+
+def json_default(obj):
+    # json.dumps hook for the stores' in-memory user objects
+    if isinstance(obj, PackedAttendance):
+        return obj.to_dict()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+class StoreBase:
+    """What JSONStore, SQLiteStore and ShardedStore share: the write methods,
+    each a check plus one _commit() of ops, and cycle totals built from a
+    cycle's records."""
+
+    def _build_totals(self, username, year, month):
+        start, end = cycle_bounds(year, month)
+        totals = empty_totals()
+        for d, r in self.attendance_range(username, start.isoformat(), end.isoformat()).items():
+            if cycle_of(d) == (year, month):  # skips malformed legacy keys
+                add_to_totals(totals, d, r)
+        return totals
+
+    def put_user(self, username, obj):
+        self._commit([{"op": "put_user", "user": username, "value": obj}])
+
+    def update_user(self, username, **fields):
+        """Set some of a user's fields (None removes one), leaving records
+        and every other field as they are in the store - unlike put_user()
+        with an object read earlier, which writes all of it back."""
+        if not self.has_user(username):
+            return False
+        self._commit([{"op": "update_user", "user": username, "fields": fields}])
+        return True
+
+    def delete_user(self, username):
+        if not self.has_user(username):
+            return False
+        self._commit([{"op": "del_user", "user": username}])
+        return True
+
+    def put_day(self, username, day_iso, rec):
+        if not self.has_user(username):
+            return False
+        self._commit([{"op": "put_day", "user": username, "day": day_iso, "value": rec}])
+        return True
+
+    def put_days(self, items):
+        """Write many (username, day_iso, rec) records in one commit.
+        Records for users that do not exist are skipped."""
+        self._commit([{"op": "put_day", "user": u, "day": d, "value": r} for u, d, r in items])
+
+    def delete_day(self, username, day_iso):
+        if self.get_day(username, day_iso) is None:
+            return False
+        self._commit([{"op": "del_day", "user": username, "day": day_iso}])
+        return True
+
+class JSONStore(StoreBase):
+    """Parsed copy of the JSON file kept in memory.
+
+    The file is only re-parsed when its mtime or size changes (i.e. another
+    worker wrote it), so lookups are dict lookups instead of a full
+    json.loads per call. Objects returned by get_user() are the cached ones:
+    treat them as read-only and go through the put/delete methods to change
+    anything.
+
+    Writes are serialized across workers with an flock on `<file>.lock`,
+    re-applied on top of the latest file contents (so a concurrent save is
+    never dropped) and published atomically. Threads that write while a
+    flush is in progress queue their ops and the next flush writes them
+    all with one fsync (group commit).
+    """
+
+    def __init__(self, path, changes=False):
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self.changes = ChangeLog(self.path.with_name(self.path.name + ".changes.db"),
+                                 CHANGES_KEEP_DAYS, CHANGES_TRIM_EVERY) if changes else None
+        self._lock = threading.RLock()
+        self._data = {}
+        self._stamp = None
+        self._lock_fd = None
+        self._lock_pid = None
+        self._cond = threading.Condition()
+        self._pending = []
+        self._flushing = False
+        self._totals = {}  # (username, year, month) -> cycle totals
+        self._indexes = {}  # "username"/"name" -> sorted [(key, username)]
+        self._max_rev = 0
+
+    def _stat(self, path=None):
+        return file_stamp(path or self.path)
+
+    def _load_snapshot(self):
+        # a corrupt file must not silently read as "no users": the next
+        # write would then wipe everyone, so only a missing/empty file is {}
+        try:
+            text = self.path.read_text()
+        except FileNotFoundError:
+            return {}
+        data = json.loads(text) if text.strip() else {}
+        for user_obj in data.values():
+            user_obj["attendance"] = PackedAttendance(user_obj.get("attendance"))
+        return data
+
+    def _fresh(self):
+        # stamp is taken before reading so a write racing the read is
+        # picked up on the next call instead of being missed
+        stamp = self._stat()
+        if stamp != self._stamp:
+            self._data = self._load_snapshot()
+            self._stamp = stamp
+            self._reset_caches()
+        return self._data
+
+    def _reset_caches(self):
+        self._totals.clear()
+        self._indexes.clear()
+        self._max_rev = max((u.get("rev", 0) for u in self._data.values()), default=0)
+
+    def _apply(self, data, op):
+        # keep already-computed cycle totals in step with the op
+        kind, user = op["op"], op["user"]
+        if kind in ("put_day", "del_day"):
+            cyc = cycle_of(op["day"])
+            totals = self._totals.get((user,) + cyc) if cyc else None
+            if totals is not None:
+                old = (data.get(user) or {}).get("attendance", {}).get(op["day"])
+                if old:
+                    add_to_totals(totals, op["day"], old, -1)
+                if kind == "put_day" and user in data:
+                    add_to_totals(totals, op["day"], op["value"])
+        else:
+            self._indexes.clear()  # rebuilt on the next listing
+            if kind == "del_user" or "attendance" in op.get("value", {}):
+                for key in [k for k in self._totals if k[0] == user]:
+                    del self._totals[key]
+        self._max_rev = max(self._max_rev, op.get("rev", 0))
+        apply_op(data, op)
+
+    def _stamp_revs(self, ops):
+        # called holding the file lock, after _fresh(): one revision per commit
+        rev = next_rev(self._max_rev)
+        for op in ops:
+            op["rev"] = rev
+
+    def _apply_all(self, data, ops):
+        """Apply a stamped commit to `data`; returns the record changes it
+        made when the change log is on."""
+        entries = []
+        for op in ops:
+            entry = self.changes and change_entry(data, op)
+            if entry:
+                entries.append(entry)
+            self._apply(data, op)
+        return entries
+
+    def _settle(self):
+        # wait for any commit in progress, in this worker or another: its
+        # revision was stamped and its changes logged under the file lock
+        with self._cond:
+            while self._flushing:
+                self._cond.wait()
+            self._flushing = True  # the flock is per fd, shared with our writers
+        try:
+            with self._file_lock():
+                pass
+        finally:
+            with self._cond:
+                self._flushing = False
+                self._cond.notify_all()
+
+    def change_rev(self):
+        return settled_rev(self._settle)
+
+    def changes_since(self, since, username=None, limit=1000):
+        return read_changes([self.changes], self._settle, since, username, limit)
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:  # no flock on this platform; threads are still serialized
+            yield
+            return
+        # flock belongs to the open file description, which a forked worker
+        # would share with its parent - each process opens its own
+        if self._lock_pid != os.getpid():
+            self._lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._lock_pid = os.getpid()
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _commit(self, ops):
+        """Queue `ops` and return once they are on disk.
+
+        Whichever thread finds no flush running becomes the leader and
+        writes every queued batch at once; the others wait for it.
+        """
+        entry = {"ops": ops, "done": False, "error": None}
+        with self._cond:
+            self._pending.append(entry)
+            while not entry["done"] and self._flushing:
+                self._cond.wait()
+            if not entry["done"]:
+                self._flushing = True
+                batch, self._pending = self._pending, []
+        if not entry["done"]:
+            error = None
+            try:
+                with self._file_lock():
+                    self._flush([op for e in batch for op in e["ops"]])
+            except Exception as exc:
+                self._stamp = None  # memory may be ahead of disk; reload next time
+                error = exc
+            with self._cond:
+                for e in batch:
+                    e["done"], e["error"] = True, error
+                self._flushing = False
+                self._cond.notify_all()
+        if entry["error"] is not None:
+            raise entry["error"]
+
+    def _flush(self, ops):
+        # called holding the file lock
+        with self._lock:
+            data = self._fresh()
+            self._stamp_revs(ops)
+            entries = self._apply_all(data, ops)
+            payload = json.dumps(data, separators=(",", ":"), default=json_default)
+        if entries:
+            self.changes.record(ops[0]["rev"], entries)
+        atomic_write(self.path, payload)
+        with self._lock:
+            self._stamp = self._stat()
+
+    def has_user(self, username):
+        with self._lock:
+            return username in self._fresh()
+
+    def user_rev(self, username):
+        """Revision of the user's last change (0 if unknown)."""
+        return (self.get_user(username) or {}).get("rev", 0)
+
+    def version(self):
+        """Opaque token that changes whenever anything in the store does."""
+        with self._lock:
+            self._fresh()
+            return repr(self._stamp)
+
+    def users_version(self):
+        """Token that changes whenever iter_users() output may have."""
+        return self.version()
+
+    def get_user(self, username):
+        with self._lock:
+            return self._fresh().get(username)
+
+    def users(self):
+        with self._lock:
+            return list(self._fresh().items())
+
+    def iter_users(self, prefix="", after=None, by="username"):
+        """Yield (key, username, user_obj) in key order, where key is the
+        username or the lower-cased name (`by`). Only keys starting with
+        `prefix` are produced, and only after the (key, username) cursor
+        `after`. Backed by a sorted index that is rebuilt lazily after a
+        user is added, changed or removed.
+        """
+        if by == "name":
+            prefix = prefix.lower()
+        with self._lock:
+            data = self._fresh()
+            index = self._indexes.get(by)
+            if index is None:
+                if by == "name":
+                    index = sorted(((u.get("name") or "").lower(), name) for name, u in data.items())
+                else:
+                    index = sorted((name, name) for name in data)
+                self._indexes[by] = index
+        i = bisect.bisect_left(index, (prefix,))
+        if after:
+            i = max(i, bisect.bisect_right(index, tuple(after)))
+        # the index list is replaced, never mutated, so iterating it
+        # outside the lock is safe
+        for key, name in itertools.islice(index, i, None):
+            if not key.startswith(prefix):
+                break
+            obj = self.get_user(name)
+            if obj is not None:
+                yield key, name, obj
+
+    def _records(self, username):
+        with self._lock:
+            return (self._fresh().get(username) or {}).get("attendance") or PackedAttendance()
+
+    def attendance(self, username):
+        return self._records(username).to_dict()
+
+    def get_day(self, username, day_iso):
+        return self._records(username).get(day_iso)
+
+    def attendance_range(self, username, start_iso, end_iso):
+        """Records with start_iso <= day <= end_iso."""
+        return self._records(username).range(start_iso, end_iso)
+
+    def attendance_slices(self, start_iso, end_iso):
+        """[(username, PackedAttendance)] of every user's records with
+        start_iso <= day <= end_iso, by username, from one snapshot."""
+        with self._lock:
+            data = self._fresh()
+            return [(name, (data[name].get("attendance") or PackedAttendance()).slice(start_iso, end_iso))
+                    for name in sorted(data)]
+
+    def cycle_totals(self, username, year, month, cache=True):
+        """Present/absent/OT/shift days for one cycle. Built from the cycle's
+        records on first use, then kept current by _apply(); with
+        cache=False a missing entry is computed but not kept (bulk reads
+        like the payroll export)."""
+        with self._lock:
+            self._fresh()
+            key = (username, year, month)
+            totals = self._totals.get(key)
+            if totals is None:
+                totals = self._build_totals(username, year, month)
+                if not cache:
+                    return totals
+                self._totals[key] = totals
+            return copy_totals(totals)
+
+class LogStore(JSONStore):
+    """JSONStore variant that appends each mutation to a JSON-lines log.
+
+    State is the snapshot (DATA_FILE) plus the ops in `<DATA_FILE>.log`
+    replayed in order, so a save writes one short line instead of the whole
+    database. Once the log holds `compact_every` ops it is folded into a
+    fresh compact snapshot and truncated. Other workers pick up appended
+    lines incrementally and only re-read the snapshot after a compaction.
+    """
+
+    def __init__(self, path, compact_every=1000, changes=False):
+        super().__init__(path, changes)
+        self.log_path = self.path.with_name(self.path.name + ".log")
+        self.compact_every = compact_every
+        self._log_pos = 0
+        self._log_ops = 0
+
+    def _replay(self):
+        try:
+            with open(self.log_path, "rb") as f:
+                f.seek(self._log_pos)
+                chunk = f.read()
+        except FileNotFoundError:
+            return
+        # ignore a trailing line that is still being written
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            try:
+                self._apply(self._data, json.loads(line))
+            except Exception:
+                continue
+            self._log_ops += 1
+        self._log_pos += end
+
+    def _fresh(self):
+        stamp = self._stat()
+        log_stamp = self._stat(self.log_path)
+        if stamp != self._stamp or (log_stamp and log_stamp[2] < self._log_pos):
+            # snapshot replaced (compaction) - rebuild from scratch
+            self._data = self._load_snapshot()
+            self._stamp = stamp
+            self._log_pos = self._log_ops = 0
+            self._reset_caches()
+        if log_stamp and log_stamp[2] > self._log_pos:
+            self._replay()
+        return self._data
+
+    def _flush(self, ops):
+        # called holding the file lock, so after _fresh() we are caught up
+        # with every other worker and own the end of the log
+        with self._lock:
+            data = self._fresh()
+            self._stamp_revs(ops)
+            entries = self._apply_all(data, ops)
+        if entries:
+            self.changes.record(ops[0]["rev"], entries)
+        payload = b"".join(json.dumps(op, separators=(",", ":"), default=json_default).encode() + b"\n" for op in ops)
+        with open(self.log_path, "ab") as f:
+            # drop a torn line left by a worker that died mid-append
+            f.truncate(self._log_pos)
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+            end = f.tell()
+        with self._lock:
+            self._log_pos = end
+            self._log_ops += len(ops)
+            if self._log_ops >= self.compact_every:
+                self._compact()
+
+    def _compact(self):
+        # called holding the file lock
+        with self._lock:
+            atomic_write(self.path, json.dumps(self._fresh(), separators=(",", ":"), default=json_default))
+            with open(self.log_path, "wb"):
+                pass
+            self._stamp = self._stat()
+            self._log_pos = self._log_ops = 0
+
+    def compact(self):
+        with self._file_lock():
+            self._compact()
+
+    def version(self):
+        with self._lock:
+            self._fresh()
+            return repr((self._stamp, self._log_pos))
+
+class SQLiteStore(StoreBase):
+    """Users and attendance as SQLite rows, one row per user per day.
+
+    The (username, day) primary key doubles as the range index, so a
+    26th-25th cycle is an indexed scan of ~31 rows instead of a walk over
+    the user's whole history. WAL journal mode lets readers in other
+    workers carry on while a write is in progress. get_user() returns the
+    user's fields only; records come from get_day/attendance_range/
+    attendance.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS users (
+        username TEXT PRIMARY KEY,
+        name     TEXT NOT NULL DEFAULT '',
+        password TEXT,
+        is_admin INTEGER NOT NULL DEFAULT 0,
+        extra    TEXT NOT NULL DEFAULT '{}',
+        rev      INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS attendance (
+        username TEXT NOT NULL,
+        day      TEXT NOT NULL,
+        shift    TEXT,
+        status   TEXT,
+        ot_hours REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (username, day)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS cycle_totals (
+        username TEXT NOT NULL,
+        year     INTEGER NOT NULL,
+        month    INTEGER NOT NULL,
+        totals   TEXT NOT NULL,
+        PRIMARY KEY (username, year, month)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS meta (
+        key   TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS users_by_name ON users (lower(name), username);
+    """
+    USER_COLUMNS = ("name", "password", "is_admin", "rev")
+
+    def __init__(self, path, changes=False):
+        self.path = str(path)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(self.SCHEMA)
+        self.changes = None
+        if changes:  # in this database, so a write and its rows commit together
+            conn.executescript(ChangeLog.SCHEMA)
+            self.changes = ChangeLog(self.path, CHANGES_KEEP_DAYS, CHANGES_TRIM_EVERY)
+        try:  # databases created before users.rev existed
+            conn.execute("ALTER TABLE users ADD COLUMN rev INTEGER NOT NULL DEFAULT 0")
+        except sqlite3.OperationalError:
+            pass
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # autocommit mode; _commit opens explicit write transactions
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
 
-def write_data(d):
-    DATA_FILE.write_text(json.dumps(d, indent=2))
+    @staticmethod
+    def _record(shift, status, ot_hours):
+        return {"shift": shift, "status": status, "ot_hours": ot_hours}
+
+    def _user_row(self, row):
+        name, password, is_admin, extra, rev = row
+        obj = json.loads(extra or "{}")
+        obj.update(name=name, password=password, is_admin=bool(is_admin), rev=rev)
+        return obj
+
+    def _apply_sql(self, conn, op):
+        """Apply one op; returns its record change like change_entry()."""
+        kind, user, entry = op["op"], op["user"], None
+        if kind == "put_user":
+            value = op["value"]
+            extra = {k: v for k, v in value.items() if k not in self.USER_COLUMNS and k != "attendance"}
+            conn.execute(
+                "INSERT INTO users (username, name, password, is_admin, extra) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(username) DO UPDATE SET name=excluded.name, password=excluded.password, "
+                "is_admin=excluded.is_admin, extra=excluded.extra",
+                (user, value.get("name") or "", value.get("password"), int(bool(value.get("is_admin"))), json.dumps(extra)))
+            if "attendance" in value:
+                conn.execute("DELETE FROM cycle_totals WHERE username = ?", (user,))
+                conn.execute("DELETE FROM attendance WHERE username = ?", (user,))
+                conn.executemany(
+                    "INSERT INTO attendance (username, day, shift, status, ot_hours) VALUES (?, ?, ?, ?, ?)",
+                    [(user, d, r.get("shift"), r.get("status"), r.get("ot_hours") or 0) for d, r in value["attendance"].items()])
+        elif kind == "update_user":
+            row = conn.execute("SELECT extra FROM users WHERE username = ?", (user,)).fetchone()
+            if row is not None:
+                extra = json.loads(row[0] or "{}")
+                for key, value in op["fields"].items():
+                    if key == "name":
+                        conn.execute("UPDATE users SET name = ? WHERE username = ?", (value or "", user))
+                    elif key == "password":
+                        conn.execute("UPDATE users SET password = ? WHERE username = ?", (value, user))
+                    elif key == "is_admin":
+                        conn.execute("UPDATE users SET is_admin = ? WHERE username = ?", (int(bool(value)), user))
+                    elif key in ("rev", "attendance"):
+                        continue
+                    elif value is None:
+                        extra.pop(key, None)
+                    else:
+                        extra[key] = value
+                conn.execute("UPDATE users SET extra = ? WHERE username = ?", (json.dumps(extra), user))
+        elif kind == "del_user":
+            conn.execute("DELETE FROM cycle_totals WHERE username = ?", (user,))
+            conn.execute("DELETE FROM attendance WHERE username = ?", (user,))
+            if conn.execute("DELETE FROM users WHERE username = ?", (user,)).rowcount:
+                entry = (user, None, True)
+        elif kind in ("put_day", "del_day"):
+            day, new = op["day"], None
+            old = conn.execute(
+                "SELECT shift, status, ot_hours FROM attendance WHERE username = ? AND day = ?", (user, day)).fetchone()
+            if kind == "put_day":
+                rec = op["value"]
+                cur = conn.execute(
+                    "INSERT OR REPLACE INTO attendance (username, day, shift, status, ot_hours) "
+                    "SELECT ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM users WHERE username = ?)",
+                    (user, day, rec.get("shift"), rec.get("status"), rec.get("ot_hours") or 0, user))
+                if cur.rowcount:
+                    new = rec
+                    entry = (user, day, False)
+            else:
+                conn.execute("DELETE FROM attendance WHERE username = ? AND day = ?", (user, day))
+                if old:
+                    entry = (user, day, True)
+            self._update_totals(conn, user, day, old and self._record(*old), new)
+        conn.execute("UPDATE users SET rev = ? WHERE username = ?", (op["rev"], user))
+        return None if op.get("archived") else entry
+
+    def _update_totals(self, conn, user, day, old, new):
+        # apply the delta to a stored cycle row; cycles nobody has asked
+        # for yet are built on first read instead
+        cyc = cycle_of(day)
+        if not cyc or not (old or new):
+            return
+        row = conn.execute(
+            "SELECT totals FROM cycle_totals WHERE username = ? AND year = ? AND month = ?", (user,) + cyc).fetchone()
+        if row is None:
+            return
+        totals = json.loads(row[0])
+        if old:
+            add_to_totals(totals, day, old, -1)
+        if new:
+            add_to_totals(totals, day, new)
+        conn.execute("UPDATE cycle_totals SET totals = ? WHERE username = ? AND year = ? AND month = ?",
+                     (json.dumps(totals),) + (user,) + cyc)
+
+    def _commit(self, ops):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rev = next_rev(self._version(conn))
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rev', ?)", (rev,))
+            entries = []
+            for op in ops:
+                op["rev"] = rev
+                entry = self._apply_sql(conn, op)
+                if entry:
+                    entries.append(entry)
+            if self.changes:
+                self.changes.record(rev, entries, conn)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _version(conn):
+        row = conn.execute("SELECT value FROM meta WHERE key = 'rev'").fetchone()
+        return row[0] if row else 0
+
+    def _settle(self):
+        # a write transaction in progress holds the database's write lock
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("ROLLBACK")
+
+    def change_rev(self):
+        return settled_rev(self._settle)
+
+    def changes_since(self, since, username=None, limit=1000):
+        return read_changes([self.changes], self._settle, since, username, limit)
+
+    def version(self):
+        return str(self._version(self._conn()))
+
+    def users_version(self):
+        return self.version()
+
+    def has_user(self, username):
+        return self._conn().execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone() is not None
+
+    def user_rev(self, username):
+        row = self._conn().execute("SELECT rev FROM users WHERE username = ?", (username,)).fetchone()
+        return row[0] if row else 0
+
+    def get_user(self, username):
+        row = self._conn().execute(
+            "SELECT name, password, is_admin, extra, rev FROM users WHERE username = ?", (username,)).fetchone()
+        return self._user_row(row) if row else None
+
+    def users(self):
+        rows = self._conn().execute("SELECT username, name, password, is_admin, extra, rev FROM users ORDER BY username")
+        return [(row[0], self._user_row(row[1:])) for row in rows]
+
+    def iter_users(self, prefix="", after=None, by="username", batch=500):
+        # keyset pagination over the primary key / users_by_name index, a
+        # batch at a time, so memory stays flat however many users exist
+        key = "lower(name)" if by == "name" else "username"
+        if by == "name":
+            prefix = prefix.lower()
+        after = tuple(after) if after else (prefix, "")
+        while True:
+            rows = self._conn().execute(
+                f"SELECT {key}, username, name, password, is_admin, extra, rev FROM users "
+                f"WHERE ({key}, username) > (?, ?) AND {key} >= ? ORDER BY {key}, username LIMIT ?",
+                after + (prefix, batch)).fetchall()
+            for row in rows:
+                if not row[0].startswith(prefix):
+                    return
+                yield row[0], row[1], self._user_row(row[2:])
+            if len(rows) < batch:
+                return
+            after = (rows[-1][0], rows[-1][1])
+
+    def attendance(self, username):
+        rows = self._conn().execute(
+            "SELECT day, shift, status, ot_hours FROM attendance WHERE username = ? ORDER BY day", (username,))
+        return {day: self._record(*rest) for day, *rest in rows}
+
+    def get_day(self, username, day_iso):
+        row = self._conn().execute(
+            "SELECT shift, status, ot_hours FROM attendance WHERE username = ? AND day = ?",
+            (username, day_iso)).fetchone()
+        return self._record(*row) if row else None
+
+    def attendance_range(self, username, start_iso, end_iso):
+        rows = self._conn().execute(
+            "SELECT day, shift, status, ot_hours FROM attendance WHERE username = ? AND day BETWEEN ? AND ? ORDER BY day",
+            (username, start_iso, end_iso))
+        return {day: self._record(*rest) for day, *rest in rows}
+
+    def attendance_slices(self, start_iso, end_iso):
+        return [(name, PackedAttendance(self.attendance_range(name, start_iso, end_iso)))
+                for _, name, _ in self.iter_users()]
+
+    def cycle_totals(self, username, year, month, cache=True):
+        conn = self._conn()
+        key = (username, year, month)
+        row = conn.execute(
+            "SELECT totals FROM cycle_totals WHERE username = ? AND year = ? AND month = ?", key).fetchone()
+        if row:
+            return json.loads(row[0])
+        if not cache:
+            # read-only: no write transaction per user during a bulk export
+            return self._build_totals(username, year, month)
+        # build it inside a write transaction so no delta slips in between
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            totals = self._build_totals(username, year, month)
+            conn.execute("INSERT OR REPLACE INTO cycle_totals (username, year, month, totals) VALUES (?, ?, ?, ?)",
+                         key + (json.dumps(totals),))
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return totals
+
+class ShardedStore(StoreBase):
+    """Users spread over `buckets` JSON files by a hash of the username,
+    plus a manifest of every user's name and admin flag.
+
+    Each bucket is a JSONStore with its own file lock, cache and group
+    commit, so a save rewrites only the owning bucket and saves for users in
+    different buckets go ahead in parallel. The manifest (itself a JSONStore
+    of {"name", "is_admin"} entries) is what iter_users() reads; it changes
+    only when a user is added, removed, renamed or has is_admin flipped.
+    """
+
+    def __init__(self, directory, buckets=64, changes=False):
+        self.dir = Path(directory)
+        self._log_changes = changes  # each bucket keeps its own log, beside its file
+        self.dir.mkdir(parents=True, exist_ok=True)
+        layout = self.dir / "layout.json"
+        try:
+            self.buckets = json.loads(layout.read_text())["buckets"]
+        except FileNotFoundError:
+            self.buckets = buckets
+            atomic_write(layout, json.dumps({"buckets": buckets}))
+        self._manifest = JSONStore(self.dir / "manifest.json")
+        self._shards = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, username):
+        digest = hashlib.blake2b(username.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % self.buckets
+
+    def _bucket_path(self, i):
+        return self.dir / f"bucket-{i:03d}.json"
+
+    def _shard_at(self, i):
+        shard = self._shards.get(i)
+        if shard is None:
+            with self._lock:
+                shard = self._shards.setdefault(i, JSONStore(self._bucket_path(i), self._log_changes))
+        return shard
+
+    def _shard(self, username):
+        return self._shard_at(self._bucket(username))
+
+    def _sync_manifest(self, ops):
+        changes = []
+        for op in ops:
+            user = op["user"]
+            if op["op"] == "put_user":
+                entry = {"name": op["value"].get("name", ""), "is_admin": bool(op["value"].get("is_admin", False))}
+                listed = self._manifest.get_user(user)
+                if not listed or {k: listed.get(k) for k in entry} != entry:
+                    changes.append({"op": "put_user", "user": user, "value": entry})
+            elif op["op"] == "update_user" and self._manifest.has_user(user):
+                listed, fields = self._manifest.get_user(user), op["fields"]
+                entry = {"name": fields.get("name", listed.get("name")) or "",
+                         "is_admin": bool(fields.get("is_admin", listed.get("is_admin")))}
+                if entry != {k: listed.get(k) for k in entry}:
+                    changes.append({"op": "put_user", "user": user, "value": entry})
+            elif op["op"] == "del_user" and self._manifest.has_user(user):
+                changes.append({"op": "del_user", "user": user})
+        if changes:
+            self._manifest._commit(changes)
+
+    def _commit(self, ops):
+        by_bucket = {}
+        for op in ops:
+            by_bucket.setdefault(self._bucket(op["user"]), []).append(op)
+        for i, group in by_bucket.items():
+            self._shard_at(i)._commit(group)
+        self._sync_manifest(ops)
+
+    def rebuild_manifest(self):
+        """Re-list every user from the buckets (after a crash between a
+        bucket write and its manifest update)."""
+        listed = {u for _, u, _ in self._manifest.iter_users()}
+        ops = []
+        for i in range(self.buckets):
+            for user, obj in self._shard_at(i).users():
+                ops.append({"op": "put_user", "user": user, "value": obj})
+                listed.discard(user)
+        ops += [{"op": "del_user", "user": u} for u in listed]
+        self._sync_manifest(ops)
+        return len(ops) - len(listed)
+
+    def version(self):
+        # file stamps only: nothing is read to produce it
+        stamps = [self._manifest._stat()]
+        stamps += [self._manifest._stat(self._bucket_path(i)) for i in range(self.buckets)]
+        return hashlib.blake2b(repr(stamps).encode(), digest_size=12).hexdigest()
+
+    def users_version(self):
+        return self._manifest.version()
+
+    def _logged(self, username=None):
+        # a user's changes are all in its bucket's log
+        return [self._shard(username)] if username else [self._shard_at(i) for i in range(self.buckets)]
+
+    def change_rev(self):
+        return settled_rev(lambda: [shard._settle() for shard in self._logged()])
+
+    def changes_since(self, since, username=None, limit=1000):
+        shards = self._logged(username)
+        return read_changes([shard.changes for shard in shards],
+                            lambda: [shard._settle() for shard in shards], since, username, limit)
+
+    def has_user(self, username):
+        return self._shard(username).has_user(username)
+
+    def user_rev(self, username):
+        return self._shard(username).user_rev(username)
+
+    def get_user(self, username):
+        return self._shard(username).get_user(username)
+
+    def users(self):
+        return [item for i in range(self.buckets) for item in self._shard_at(i).users()]
+
+    def iter_users(self, prefix="", after=None, by="username"):
+        # manifest entries: name and is_admin only, no attendance
+        return self._manifest.iter_users(prefix, after, by)
+
+    def attendance(self, username):
+        return self._shard(username).attendance(username)
+
+    def get_day(self, username, day_iso):
+        return self._shard(username).get_day(username, day_iso)
+
+    def attendance_range(self, username, start_iso, end_iso):
+        return self._shard(username).attendance_range(username, start_iso, end_iso)
+
+    def attendance_slices(self, start_iso, end_iso):
+        return sorted((item for i in range(self.buckets)
+                       for item in self._shard_at(i).attendance_slices(start_iso, end_iso)),
+                      key=lambda item: item[0])
+
+    def cycle_totals(self, username, year, month, cache=True):
+        return self._shard(username).cycle_totals(username, year, month, cache)
+
+    def put_day(self, username, day_iso, rec):
+        return self._shard(username).put_day(username, day_iso, rec)
+
+    def put_days(self, items):
+        by_bucket = {}
+        for item in items:
+            by_bucket.setdefault(self._bucket(item[0]), []).append(item)
+        for i, group in by_bucket.items():
+            self._shard_at(i).put_days(group)
+
+    def delete_day(self, username, day_iso):
+        return self._shard(username).delete_day(username, day_iso)
+
+def encode_segment(records):
+    """gzip'd segment for one user's archived cycle year: standard records
+    as [day, shift, status, ot_hours] rows (others verbatim) plus each
+    cycle's totals keyed by month."""
+    import gzip
+    rows, other, totals = [], {}, {}
+    for day in sorted(records):
+        rec = records[day]
+        if rec.keys() == RECORD_KEYS:
+            rows.append([day, rec["shift"], rec["status"], rec["ot_hours"]])
+        else:
+            other[day] = rec
+        cyc = cycle_of(day)
+        if cyc:
+            add_to_totals(totals.setdefault(str(cyc[1]), empty_totals()), day, rec)
+    payload = {"rows": rows, "other": other, "totals": totals}
+    return gzip.compress(json.dumps(payload, separators=(",", ":")).encode(), mtime=0)
+
+def decode_segment(blob):
+    import gzip
+    payload = json.loads(gzip.decompress(blob))
+    records = {day: {"shift": shift, "status": status, "ot_hours": ot}
+               for day, shift, status, ot in payload["rows"]}
+    records.update(payload["other"])
+    return {"records": PackedAttendance(records), "totals": payload["totals"]}
+
+class ArchivedCycle(Exception):
+    """A write to a day whose cycle has been archived."""
+
+class ArchivedStore:
+    """A store plus cold history: cycles up to `through` are kept out of it,
+    in gzip'd segments under `directory`, one per user and cycle year
+    (<year>/<username>.json.gz).
+
+    A segment is only read when one of its days, its totals (stored with
+    it) or a user's full history is asked for, and the most recently used
+    ones stay decoded in memory. Archived cycles are read-only: writes to
+    them raise ArchivedCycle. Everything about users themselves goes
+    straight to the hot store.
+
+    state.json holds "through" and, while archive() runs, "pending": writes
+    up to pending are refused, reads switch to the segments only once
+    through moves, and the hot copies are deleted after that, so a crash at
+    any step loses nothing and re-running archive() finishes the job.
+    """
+
+    def __init__(self, inner, directory):
+        self.inner = inner
+        self.dir = Path(directory)
+        self.state_path = self.dir / "state.json"
+        self._state = (None, None)
+        self._state_stamp = ()  # never a real stamp, so the first call reads
+        self._segments = OrderedDict()  # (username, year) -> (stamp, segment)
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def _read_state(self):
+        """(through, pending) as (year, month) tuples or None."""
+        stamp = file_stamp(self.state_path)
+        if stamp != self._state_stamp:
+            state = json.loads(self.state_path.read_text()) if stamp else {}
+            self._state = tuple(tuple(map(int, state[k].split("-"))) if state.get(k) else None
+                                for k in ("through", "pending"))
+            self._state_stamp = stamp
+        return self._state
+
+    def _write_state(self, through, pending):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        fmt = lambda cyc: "%04d-%02d" % cyc if cyc else None
+        atomic_write(self.state_path, json.dumps({"through": fmt(through), "pending": fmt(pending)}))
+
+    def _archived(self, cyc):
+        through = self._read_state()[0]
+        return bool(cyc and through and cyc <= through)
+
+    def _refuse_archived(self, days):
+        limits = [c for c in self._read_state() if c]
+        for day in days:
+            cyc = cycle_of(day)
+            if cyc and limits and cyc <= max(limits):
+                raise ArchivedCycle(day)
+
+    def _segment_path(self, username, year):
+        return self.dir / str(year) / (quote(username, safe="") + ".json.gz")
+
+    def _segment_years(self, username):
+        if not self.dir.is_dir():
+            return []
+        return sorted(int(p.name) for p in self.dir.iterdir()
+                      if p.name.isdigit() and self._segment_path(username, int(p.name)).exists())
+
+    def _segment(self, username, year):
+        """{"records": PackedAttendance, "totals": {"<month>": totals}};
+        empty for a year nothing was archived in."""
+        key = (username, year)
+        path = self._segment_path(username, year)
+        stamp = file_stamp(path)
+        with self._lock:
+            cached = self._segments.get(key)
+            if cached and cached[0] == stamp:
+                self._segments.move_to_end(key)
+                return cached[1]
+        segment = decode_segment(path.read_bytes()) if stamp else {"records": PackedAttendance(), "totals": {}}
+        with self._lock:
+            self._segments[key] = (stamp, segment)
+            while len(self._segments) > ARCHIVE_CACHE_SIZE:
+                self._segments.popitem(last=False)
+        return segment
+
+    def version(self):
+        return repr((self.inner.version(), file_stamp(self.state_path)))
+
+    def attendance(self, username):
+        through = self._read_state()[0]
+        hot = self.inner.attendance(username)
+        if not through:
+            return hot
+        out = {}
+        for year in self._segment_years(username):
+            out.update((d, r) for d, r in self._segment(username, year)["records"].items()
+                       if (cycle_of(d) or through) <= through)
+        out.update((d, r) for d, r in hot.items() if not self._archived(cycle_of(d)))
+        return out
+
+    def get_day(self, username, day_iso):
+        cyc = cycle_of(day_iso)
+        if self._archived(cyc):
+            return self._segment(username, cyc[0])["records"].get(day_iso)
+        return self.inner.get_day(username, day_iso)
+
+    def attendance_range(self, username, start_iso, end_iso):
+        through = self._read_state()[0]
+        first, last = cycle_of(start_iso), cycle_of(end_iso)
+        if not through or not first or first > through:
+            return self.inner.attendance_range(username, start_iso, end_iso)
+        out = {}
+        for year in range(first[0], min(last or through, through)[0] + 1):
+            records = self._segment(username, year)["records"].range(start_iso, end_iso)
+            out.update((d, r) for d, r in records.items() if (cycle_of(d) or through) <= through)
+        if not last or last > through:
+            records = self.inner.attendance_range(username, start_iso, end_iso)
+            out.update((d, r) for d, r in records.items() if not self._archived(cycle_of(d)))
+        return out
+
+    def attendance_slices(self, start_iso, end_iso):
+        if not self._archived(cycle_of(start_iso)):
+            return self.inner.attendance_slices(start_iso, end_iso)
+        return [(name, PackedAttendance(self.attendance_range(name, start_iso, end_iso)))
+                for _, name, _ in self.iter_users()]
+
+    def cycle_totals(self, username, year, month, cache=True):
+        if self._archived((year, month)):
+            totals = self._segment(username, year)["totals"].get(str(month))
+            return copy_totals(totals) if totals else empty_totals()
+        return self.inner.cycle_totals(username, year, month, cache)
+
+    def delete_user(self, username):
+        if not self.inner.delete_user(username):
+            return False
+        for year in self._segment_years(username):
+            self._segment_path(username, year).unlink(missing_ok=True)
+        return True
+
+    def put_day(self, username, day_iso, rec):
+        self._refuse_archived([day_iso])
+        return self.inner.put_day(username, day_iso, rec)
+
+    def put_days(self, items):
+        self._refuse_archived(d for _, d, _ in items)
+        self.inner.put_days(items)
+
+    def delete_day(self, username, day_iso):
+        self._refuse_archived([day_iso])
+        return self.inner.delete_day(username, day_iso)
+
+    def archive(self, through):
+        """Move every cycle up to `through` (year, month) out of the hot
+        store; returns (users, records) archived. Days whose key is not an
+        ISO date (legacy rows) belong to no cycle and stay hot."""
+        current, pending = self._read_state()
+        through = max(c for c in (through, current, pending) if c)
+        self._write_state(current, through)
+        last_day = cycle_bounds(*through)[1].isoformat()
+        usernames = [u for _, u, _ in self.inner.iter_users()]
+        users = moved = 0
+        for uname in usernames:
+            by_year = {}
+            for d, r in self.inner.attendance_range(uname, "0001-01-01", last_day).items():
+                cyc = cycle_of(d)
+                if cyc:
+                    by_year.setdefault(cyc[0], {})[d] = r
+            for year, records in by_year.items():
+                merged = self._segment(uname, year)["records"].to_dict()
+                merged.update(records)
+                path = self._segment_path(uname, year)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                atomic_write(path, encode_segment(merged))
+            users += bool(by_year)
+            moved += sum(map(len, by_year.values()))
+        self._write_state(through, None)
+        # only days the segments hold are dropped: a save that raced the
+        # copy above stays hot (and unseen) until the next run moves it
+        ops = []
+        for uname in usernames:
+            for d, r in self.inner.attendance_range(uname, "0001-01-01", last_day).items():
+                cyc = cycle_of(d)
+                if cyc and self._segment(uname, cyc[0])["records"].get(d) == r:
+                    ops.append({"op": "del_day", "user": uname, "day": d, "archived": True})
+            if len(ops) >= ARCHIVE_BATCH:
+                self.inner._commit(ops)
+                ops = []
+        if ops:
+            self.inner._commit(ops)
+        return users, moved
+
+class ChangeLog:
+    """Which attendance records a store changed: an SQLite table of
+    (rev, username, day, deleted) rows, where rev is the revision the store
+    stamped on the commit.
+
+    The store enters a commit's rows while it still holds its write lock
+    and before the data is published - for the sqlite backend in the same
+    transaction - so a crash can leave a row whose write never landed
+    (readers then just see the record unchanged) but never a write without
+    its row. read_changes() waits for the store's writers before it reads,
+    so every row at or below the rev it returns is in the log and published.
+
+    Writing a record again replaces its row, and a deleted user's rows are
+    replaced by a single tombstone (day ''), so the log holds at most one
+    row per record and reading it costs the number of changes, not the
+    size of anyone's history. Rows older than `keep_days` are trimmed;
+    "horizon" is then the highest rev that may have been dropped, and a
+    reader that is further behind must reload.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS changes (
+        username TEXT NOT NULL,
+        day      TEXT NOT NULL,
+        rev      INTEGER NOT NULL,
+        deleted  INTEGER NOT NULL,
+        PRIMARY KEY (username, day)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS changes_by_rev ON changes (rev);
+    CREATE INDEX IF NOT EXISTS changes_by_user ON changes (username, rev);
+    CREATE TABLE IF NOT EXISTS meta (
+        key   TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+    """
+
+    def __init__(self, path, keep_days=30, trim_every=1000):
+        self.path = str(path)
+        self.keep_days = keep_days
+        self.trim_every = trim_every
+        self._local = threading.local()
+        self._ready = False  # schema created on first use, not at import
+        self._ready_lock = threading.Lock()
+        self._writes = itertools.count(1)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._ready_lock:
+                if not self._ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.executescript(self.SCHEMA)
+                    self._ready = True
+            self._local.conn = conn
+        return conn
+
+    def record(self, rev, entries, conn=None):
+        """Log (username, day, deleted) entries of the commit at `rev`; day
+        None = the user was deleted. With `conn`, inside its open
+        transaction (the sqlite store's own), else in one of its own."""
+        if not entries:
+            return
+        if conn is None:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.record(rev, entries, conn)
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return
+        for user, day, deleted in entries:
+            if day is None:
+                conn.execute("DELETE FROM changes WHERE username = ?", (user,))
+            conn.execute("INSERT OR REPLACE INTO changes (username, day, rev, deleted) VALUES (?, ?, ?, ?)",
+                         (user, day or "", rev, int(deleted)))
+        if next(self._writes) % self.trim_every == 0:
+            self.trim(conn)
+
+    def trim(self, conn):
+        # inside a write transaction; revs are microsecond timestamps
+        cutoff = int((time.time() - self.keep_days * 86400) * 1e6)
+        dropped = conn.execute("SELECT max(rev) FROM changes WHERE rev < ?", (cutoff,)).fetchone()[0]
+        if dropped:
+            conn.execute("DELETE FROM changes WHERE rev <= ?", (dropped,))
+            conn.execute("INSERT INTO meta (key, value) VALUES ('change_horizon', ?) "
+                         "ON CONFLICT(key) DO UPDATE SET value = max(value, excluded.value)", (dropped,))
+
+    def read(self, since, until, username=None, limit=None):
+        """(horizon, rows) for rows with since < rev <= until, oldest
+        first; only `username`'s unless it is None. Rows are (rev,
+        username, day, deleted) with day None for a deleted user."""
+        if not os.path.exists(self.path):  # nothing logged here yet
+            return 0, []
+        conn = self._conn()
+        query, args = "SELECT rev, username, day, deleted FROM changes WHERE rev > ? AND rev <= ?", [since, until]
+        if username is not None:
+            query += " AND username = ?"
+            args.append(username)
+        query += " ORDER BY rev" + (" LIMIT %d" % limit if limit is not None else "")
+        conn.execute("BEGIN")  # one snapshot for both reads
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'change_horizon'").fetchone()
+            rows = conn.execute(query, args).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        return row[0] if row else 0, [(rev, user, day or None, bool(deleted)) for rev, user, day, deleted in rows]
+
+def settled_rev(settle):
+    """A rev that every logged write at or below it has reached: revs are
+    stamped from the clock under the store's write lock, so once `settle`
+    (which waits for writers holding it) returns, none below now can
+    still appear."""
+    rev = time.time_ns() // 1000 - 1
+    settle()
+    return rev
+
+def read_changes(logs, settle, since, username=None, limit=1000):
+    """(horizon, latest, rows, more) from a store's ChangeLogs (one per
+    bucket for the sharded store): rows after `since` up to the settled
+    rev `latest`, oldest first, at most `limit` of them unless one commit
+    alone has more, and never part of a commit."""
+    latest = settled_rev(settle)
+    horizon, rows = 0, []
+    for log in logs:
+        h, part = log.read(since, latest, username, limit + 1)
+        horizon, rows = max(horizon, h), rows + part
+    rows.sort()
+    more = len(rows) > limit
+    if more:
+        cut = rows[limit][0]
+        rows = [r for r in rows[:limit] if r[0] < cut]
+        if not rows:
+            for log in logs:
+                rows += log.read(cut - 1, cut, username)[1]
+            rows.sort()
+    return horizon, latest, rows, more
+
+@app.errorhandler(ArchivedCycle)
+def archived_cycle(_e):
+    return jsonify({"error":"That cycle is archived and read-only"}), 409
+
+def open_store(backend=None):
+    backend = backend or STORAGE_BACKEND
+    if backend == "sqlite":
+        hot = SQLiteStore(SQLITE_FILE, changes=CHANGES_LOG)
+    elif backend == "sharded":
+        hot = ShardedStore(SHARD_DIR, SHARD_BUCKETS, changes=CHANGES_LOG)
+    elif backend == "log":
+        hot = LogStore(DATA_FILE, compact_every=LOG_COMPACT_EVERY, changes=CHANGES_LOG)
+    else:
+        hot = JSONStore(DATA_FILE, changes=CHANGES_LOG)
+    if ARCHIVE_DIR:
+        hot = ArchivedStore(hot, ARCHIVE_DIR)
+    return hot
+
+store = TimedStore(open_store)
 
 # ---------------------------
 # Keep your helpers
 # ---------------------------
-def make_shift_line(shift_dates):
+def make_shift_line(shift_dates, sep="<br>"):
     ordered_shifts = ["FS", "SS", "NS", "GEN2"]
     shift_names = {"FS": "First Shift", "SS": "Second Shift", "NS": "Night Shift"}
     parts = []
@@ -49,7 +1697,46 @@ def make_shift_line(shift_dates):
         if s not in ordered_shifts and shift_dates[s]:
             label = shift_names.get(s, s)
             parts.append(f"{label}: {', '.join(str(x) for x in sorted(set(shift_dates[s])))}")
-    return "<br>".join(parts)
+    return sep.join(parts)
+
+MAX_BULK_ENTRIES = 1000
+
+def make_record(rec):
+    try:
+        ot = float(rec.get("ot_hours", 0) or 0)
+    except:
+        ot = 0.0
+    return {"shift": rec.get("shift"), "status": rec.get("status"), "ot_hours": ot}
+
+def validate_entry(entry):
+    """Check one bulk entry; returns (day_iso, record) or raises ValueError."""
+    if not isinstance(entry, dict):
+        raise ValueError("Entry must be an object")
+    try:
+        day = date.fromisoformat(str(entry.get("date"))).isoformat()
+    except ValueError:
+        raise ValueError("Invalid or missing date")
+    if entry.get("shift", "GEN") not in SHIFTS:
+        raise ValueError("Unknown shift")
+    if entry.get("status") not in STATUSES:
+        raise ValueError("Status must be Present or Absent")
+    try:
+        ot = float(entry.get("ot_hours", 0) or 0)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid ot_hours")
+    if ot < 0:
+        raise ValueError("Invalid ot_hours")
+    return day, {"shift": entry.get("shift", "GEN"), "status": entry["status"], "ot_hours": ot}
+
+def bulk_entries():
+    """Entry list from a bulk request body: either a bare list or {"entries": [...]}."""
+    payload = request.get_json(force=True, silent=True)
+    entries = payload.get("entries") if isinstance(payload, dict) else payload
+    if not isinstance(entries, list) or not entries:
+        return None, (jsonify({"error":"Expected a non-empty list of entries"}), 400)
+    if len(entries) > MAX_BULK_ENTRIES:
+        return None, (jsonify({"error":f"At most {MAX_BULK_ENTRIES} entries per request"}), 413)
+    return entries, None
 
 # ---------------------------
 # Templates (slightly adjusted to use server-set name + token auth)
@@ -200,38 +1887,7 @@ MAIN_HTML = """
 <title>Self Attendance</title>
 <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css" rel="stylesheet">
 <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.5.0/css/all.min.css">
-<style>
-body{background:#fafbff;font-family:system-ui;margin:0;padding:0;}
-.container-wrap{max-width:980px;margin:24px auto;padding:12px;}
-.header{display:flex;justify-content:space-between;align-items:center;margin-bottom:12px}
-.header .welcome{font-weight:700}
-.header .actions{display:flex;gap:8px;align-items:center}
-.calendar-card{position:relative;width:100%;max-width:739px;height:314px;margin:0 auto;
-  background:url('http://176.9.41.10:8080/dl/690a8f9cac442ce7a2ee3114') no-repeat center;background-size:cover;
-  border-radius:15px;box-shadow:0 6px 20px rgba(20,20,30,.06);display:flex;justify-content:center;align-items:flex-start;}
-.month-nav{position:absolute;top:220px;left:50%;transform:translateX(-50%);display:flex;align-items:center;
-  justify-content:space-between;background:rgba(255,255,255,0.25);backdrop-filter:blur(12px);border-radius:14px;
-  padding:8px 20px;width:220px;box-shadow:0 3px 8px rgba(0,0,0,0.05);border:1px solid rgba(255,255,255,0.4);}
-.nav-btn{color:#333;font-size:18px;text-decoration:none;transition:.2s;}
-.nav-btn:hover{color:#000;transform:scale(1.1);}
-.month-label{font-weight:700;font-size:18px;color:#111;}
-.day-cell{height:92px;border:1px solid #f0f2f7;cursor:pointer;position:relative;padding:8px;background:white;transition:transform .06s;}
-.day-cell:active{transform:scale(.997);}
-.day-num{font-weight:700;font-size:14px;}
-.present{background:#e9fbe9;}
-.absent{background:#fff0f0;}
-.sunday{background:#f2f2f2;color:#6b7280;}
-.shift-label{font-size:12px;color:#6b7280;margin:0 2px;}
-.status-pill{position:absolute;right:10px;top:18px;padding:4px 0;border-radius:999px;font-size:12px;background:white;border:1px solid #e6e9ef;min-width:20px;text-align:center;}
-.status-pill:empty{display:none;}
-.ot-badge{font-size:10px;color:#374151;margin-top:0;display:block;}
-.today-border{outline:3px solid rgba(59,130,246,0.18);border-radius:8px;}
-.summary-box{margin-top:18px;padding:10px;border-radius:10px;background:#f7f7f7;border:1px solid #eee;display:flex;flex-direction:column;gap:6px;}
-.summary-top{font-weight:700;}
-.summary-top span{margin-right:6px;}
-.summary-shifts{font-weight:600;color:#374151;}
-.table-responsive{margin-top:14px}
-</style></head><body>
+<link rel="stylesheet" href="{{ url_for('static', filename='calendar.css') }}"></head><body>
 <div class="container-wrap">
   <div class="header">
     <div class="welcome">Hi, <span id="userName">{{ current_name }}</span></div>
@@ -245,44 +1901,23 @@ body{background:#fafbff;font-family:system-ui;margin:0;padding:0;}
 
   <div class="calendar-card">
     <div class="month-nav shadow-sm">
-      <a class="nav-btn" href="/?month={{ month-1 if month>1 else 12 }}&year={{ year if month>1 else year-1 }}"><i class="fa-solid fa-arrow-left"></i></a>
-      <div class="month-label">{{ calendar.month_name[month] }} {{ year }}</div>
-      <a class="nav-btn" href="/?month={{ month+1 if month<12 else 1 }}&year={{ year if month<12 else year+1 }}"><i class="fa-solid fa-arrow-right"></i></a>
+      <a class="nav-btn" id="prevMonth" href="#"><i class="fa-solid fa-arrow-left"></i></a>
+      <div class="month-label" id="monthLabel"></div>
+      <a class="nav-btn" id="nextMonth" href="#"><i class="fa-solid fa-arrow-right"></i></a>
     </div>
   </div>
 
   <div class="table-responsive"><table class="table table-borderless">
     <thead><tr><th class="text-center">S</th><th class="text-center">M</th><th class="text-center">T</th><th class="text-center">W</th><th class="text-center">T</th><th class="text-center">F</th><th class="text-center">S</th></tr></thead>
-    <tbody>
-    {% for week in weeks %}
-    <tr>
-      {% for d in week %}
-        {% if d %}
-          {% set iso = d.isoformat() %}
-          {% set rec = attendance.get(iso, {}) %}
-          {% set today_flag = (d == today) %}
-          {% set is_sunday = (d.weekday() == 6) %}
-          <td class="p-0">
-            <div class="day-cell{% if rec.get('status') == 'Present' %} present{% elif rec.get('status') == 'Absent' %} absent{% endif %}{% if is_sunday %} sunday{% endif %}{% if today_flag %} today-border{% endif %}" data-date="{{ iso }}">
-              <div class="d-flex justify-content-between"><div class="day-num">{{ d.day }}</div><div class="status-pill">{{ rec.get('status','')[:1] if rec.get('status') else '' }}</div></div>
-              <div style="position:absolute;bottom:8px;left:8px;right:8px;">
-                <div class="ot-badge">{% if rec.get('ot_hours') %}OT: {{ rec.get('ot_hours') }}{% endif %}</div>
-                <div class="shift-label">{% if rec.get('shift') and rec.get('shift') != 'GEN' %}{{ rec.get('shift') }}{% else %}GEN{% endif %}</div>
-              </div>
-            </div>
-          </td>
-        {% else %}<td class="p-0"></td>{% endif %}
-      {% endfor %}
-    </tr>{% endfor %}
-    </tbody></table></div>
+    <tbody id="calBody"></tbody></table></div>
 
   <div class="summary-box" id="summaryBox">
     <div class="summary-top">
-      🟢 <b>Present:</b> <span id="presentCount">{{ total_present }}</span> |
-      🔴 <b>Absent:</b> <span id="absentCount">{{ total_absent }}</span> |
-      🕒 <b>OT Hours:</b> <span id="otHoursTotal">{{ "%.1f"|format(total_ot_hours) }}</span>
+      🟢 <b>Present:</b> <span id="presentCount"></span> |
+      🔴 <b>Absent:</b> <span id="absentCount"></span> |
+      🕒 <b>OT Hours:</b> <span id="otHoursTotal"></span>
     </div>
-    <div class="summary-shifts" id="shiftLine">⚙️ <b>Shifts →</b><br>{{ shift_line|safe }}</div>
+    <div class="summary-shifts" id="shiftLine"></div>
   </div>
 
   <!-- Modal -->
@@ -321,83 +1956,7 @@ body{background:#fafbff;font-family:system-ui;margin:0;padding:0;}
   </div>
 
 <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/js/bootstrap.bundle.min.js"></script>
-<script>
-document.addEventListener('DOMContentLoaded', function(){
-  const bsModal=new bootstrap.Modal(document.getElementById('attModal'));
-  let currentDate=null,selectedShift='GEN',selectedStatus='Present';
-  const shiftLine=document.getElementById('shiftLine');
-
-  function setShiftActive(s){selectedShift=s;document.querySelectorAll('.btn-shift').forEach(b=>{const act=b.dataset.shift===s;b.classList.toggle('btn-primary',act);b.classList.toggle('btn-outline-secondary',!act);});}
-  function setStatusActive(s){selectedStatus=s;const p=document.getElementById('markPresent'),a=document.getElementById('markAbsent');
-    if(s==='Present'){p.classList.add('btn-success');p.classList.remove('btn-outline-success');a.classList.add('btn-outline-danger');a.classList.remove('btn-danger');}
-    else{a.classList.add('btn-danger');a.classList.remove('btn-outline-danger');p.classList.add('btn-outline-success');p.classList.remove('btn-success');document.getElementById('otHours').value=0;}
-  }
-
-  document.querySelectorAll('.day-cell').forEach(el=>{
-    el.addEventListener('click',async function(){
-      currentDate=this.dataset.date;document.getElementById('modalDate').textContent=currentDate;
-      setShiftActive('GEN');setStatusActive('Present');document.getElementById('otHours').value=0;
-      try{const r=await fetch('/attendance/'+currentDate);if(r.ok){const d=await r.json();if(d){setShiftActive(d.shift||'GEN');setStatusActive(d.status||'Present');document.getElementById('otHours').value=d.ot_hours||0;}}}catch(e){}
-      bsModal.show();
-    });
-  });
-
-  document.querySelectorAll('.btn-shift').forEach(b=>b.addEventListener('click',()=>setShiftActive(b.dataset.shift)));
-  document.getElementById('markPresent').onclick=()=>setStatusActive('Present');
-  document.getElementById('markAbsent').onclick=()=>setStatusActive('Absent');
-
-  async function updateSummary(){
-    const r=await fetch('/summary');
-    if(r.ok){
-      const s=await r.json();
-      document.getElementById('presentCount').textContent=s.present;
-      document.getElementById('absentCount').textContent=s.absent;
-      document.getElementById('otHoursTotal').textContent=s.ot_hours.toFixed(1);
-      shiftLine.innerHTML='⚙️ <b>Shifts →</b><br>'+s.shift_line;
-    }
-  }
-
-  document.getElementById('saveBtn').onclick=async()=>{
-    if(!currentDate)return;
-    const otVal=selectedStatus==='Absent'?0:parseFloat(document.getElementById('otHours').value||0);
-    const payload={date:currentDate,shift:selectedShift,status:selectedStatus,ot_hours:otVal};
-    try{
-      const res=await fetch('/attendance',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify(payload)});
-      if(res.ok){
-        bsModal.hide();
-        const cell=document.querySelector('.day-cell[data-date="'+currentDate+'"]');
-        if(cell){cell.classList.remove('present','absent');
-          if(selectedStatus==='Present')cell.classList.add('present');
-          else if(selectedStatus==='Absent')cell.classList.add('absent');
-          cell.querySelector('.status-pill').textContent=selectedStatus[0];
-          cell.querySelector('.ot-badge').textContent=otVal?('OT: '+otVal):'';
-          cell.querySelector('.shift-label').textContent=selectedShift;}
-        updateSummary();
-      } else {
-        const j = await res.json().catch(()=>({error:'Save failed'}));
-        alert(j.error || 'Save failed');
-      }
-    }catch(e){alert('Save failed:'+e.message);}
-  };
-
-  document.getElementById('clearBtn').onclick=async()=>{
-    if(!currentDate||!confirm('Clear attendance for '+currentDate+'?'))return;
-    try{
-      const r=await fetch('/attendance/'+currentDate,{method:'DELETE'});
-      if(r.ok){
-        bsModal.hide();
-        const cell=document.querySelector('.day-cell[data-date="'+currentDate+'"]');
-        if(cell){cell.classList.remove('present','absent');cell.querySelector('.status-pill').textContent='';cell.querySelector('.ot-badge').textContent='';cell.querySelector('.shift-label').textContent='GEN';}
-        updateSummary();
-      } else {
-        const j = await r.json().catch(()=>({error:'Clear failed'}));
-        alert(j.error || 'Clear failed');
-      }
-    }catch(e){alert('Clear failed:'+e.message);}
-  };
-  setShiftActive('GEN');setStatusActive('Present');
-});
-</script></div></body></html>
+<script src="{{ url_for('static', filename='calendar.js') }}"></script></div></body></html>
 """
 
 # ---------------------------
@@ -412,30 +1971,65 @@ ADMIN_HTML = """
 <div class="container">
   <h3>Admin Dashboard</h3>
   <p>Signed in as <b>{{ current_name }}</b> (<a href="/">Back to app</a>)</p>
+  <div class="d-flex gap-2 mb-2" style="max-width:480px">
+    <input id="userSearch" class="form-control form-control-sm" placeholder="Search (prefix)">
+    <select id="searchBy" class="form-select form-select-sm" style="max-width:140px">
+      <option value="username">Username</option><option value="name">Name</option>
+    </select>
+  </div>
+  <form class="d-flex gap-2 mb-3" style="max-width:480px" action="/api/admin/export" method="get">
+    <input type="month" id="exportMonth" class="form-control form-control-sm" required>
+    <select name="format" class="form-select form-select-sm" style="max-width:100px">
+      <option value="csv">CSV</option><option value="xlsx">XLSX</option>
+    </select>
+    <input type="hidden" name="year"><input type="hidden" name="month">
+    <button class="btn btn-sm btn-outline-primary text-nowrap">Export cycle</button>
+  </form>
+  <div class="card mb-3" style="max-width:480px"><div class="card-body py-2">
+    <div>Present today: <b id="liveCount">&hellip;</b> <small id="liveState" class="text-muted"></small></div>
+    <ul id="liveFeed" class="list-unstyled small text-muted mb-0"></ul>
+  </div></div>
   <div id="usersWrap"></div>
+  <button id="moreBtn" class="btn btn-sm btn-outline-secondary" style="display:none">Load more</button>
 </div>
 <script>
-async function loadUsers(){
-  const r = await fetch('/api/admin/users');
+// one page at a time from /api/admin/users; "Load more" follows next_cursor
+let nextCursor = null;
+const esc = s => String(s).replace(/[&<>"']/g, c => ({'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;',"'":'&#39;'}[c]));
+
+async function loadUsers(more){
+  const params = new URLSearchParams({limit: 100, q: document.getElementById('userSearch').value.trim(),
+                                      by: document.getElementById('searchBy').value});
+  if (more && nextCursor) params.set('cursor', nextCursor);
+  const r = await fetch('/api/admin/users?' + params);
   if (!r.ok) { document.getElementById('usersWrap').innerText='Failed to load users'; return; }
   const j = await r.json();
   const wrap = document.getElementById('usersWrap');
-  wrap.innerHTML = '';
-  const tbl = document.createElement('table'); tbl.className='table';
-  const thead = document.createElement('thead'); thead.innerHTML='<tr><th>User</th><th>Name</th><th>Admin</th><th>Actions</th></tr>';
-  tbl.appendChild(thead);
-  const tbody = document.createElement('tbody');
+  let tbody = document.getElementById('usersBody');
+  if (!more || !tbody){
+    wrap.innerHTML = '';
+    const tbl = document.createElement('table'); tbl.className='table';
+    const thead = document.createElement('thead'); thead.innerHTML='<tr><th>User</th><th>Name</th><th>Admin</th><th>Actions</th></tr>';
+    tbl.appendChild(thead);
+    tbody = document.createElement('tbody'); tbody.id = 'usersBody';
+    tbl.appendChild(tbody);
+    wrap.appendChild(tbl);
+  }
   for (const u of j.users){
     const tr = document.createElement('tr');
-    tr.innerHTML = `<td>${u.username}</td><td>${u.name||''}</td><td>${u.is_admin? 'Yes':'No'}</td>
+    tr.dataset.username = u.username;
+    tr.innerHTML = `<td>${esc(u.username)}</td><td>${esc(u.name||'')}</td><td>${u.is_admin? 'Yes':'No'}</td>
       <td>
-        <button class="btn btn-sm btn-primary" onclick="view('${u.username}')">View</button>
-        <button class="btn btn-sm btn-danger" onclick="del('${u.username}')">Delete</button>
+        <button class="btn btn-sm btn-primary">View</button>
+        <button class="btn btn-sm btn-danger">Delete</button>
       </td>`;
+    const [bView, bDel] = tr.querySelectorAll('button');
+    bView.onclick = () => view(u.username);
+    bDel.onclick = () => del(u.username);
     tbody.appendChild(tr);
   }
-  tbl.appendChild(tbody);
-  wrap.appendChild(tbl);
+  nextCursor = j.next_cursor;
+  document.getElementById('moreBtn').style.display = nextCursor ? '' : 'none';
 }
 
 async function view(username){
@@ -448,29 +2042,148 @@ async function view(username){
 async function del(username){
   if (!confirm('Delete user '+username+' ?')) return;
   const r = await fetch('/api/admin/user/' + encodeURIComponent(username), {method:'DELETE'});
-  if (r.ok) { alert('Deleted'); loadUsers(); }
+  if (r.ok) { alert('Deleted'); }  // the live feed removes the row
   else { const j = await r.json().catch(()=>({error:'failed'})); alert(j.error||'Failed'); }
 }
 
+// payroll export: the month picker fills ?year=&month= for /api/admin/export
+const exportForm = document.getElementById('exportMonth').form;
+document.getElementById('exportMonth').value = new Date().toISOString().slice(0, 7);
+exportForm.addEventListener('submit', () => {
+  const [y, m] = document.getElementById('exportMonth').value.split('-');
+  exportForm.elements.year.value = y; exportForm.elements.month.value = +m;
+});
+
+// live feed from /api/admin/events: today's headcount starts from the cycle
+// report (re-read on every (re)connect) and then follows attendance events
+const now = new Date();
+const today = [now.getFullYear(), String(now.getMonth() + 1).padStart(2, '0'),
+               String(now.getDate()).padStart(2, '0')].join('-');
+let presentToday = null;
+async function loadHeadcount(){
+  const r = await fetch(`/api/admin/headcount?date=${today}`);
+  if (!r.ok) return;
+  presentToday = (await r.json()).present;
+  document.getElementById('liveCount').innerText = presentToday;
+}
+function feed(text){
+  const ul = document.getElementById('liveFeed');
+  const li = document.createElement('li');
+  li.textContent = new Date().toLocaleTimeString() + '  ' + text;
+  ul.prepend(li);
+  while (ul.children.length > 10) ul.lastChild.remove();
+}
+const isPresent = rec => !!rec && rec.status === 'Present';
+const live = new EventSource('/api/admin/events');
+live.addEventListener('attendance', e => {
+  for (const c of JSON.parse(e.data).changes){
+    if (c.date === today && presentToday !== null){
+      presentToday += isPresent(c.record) - isPresent(c.previous);
+      document.getElementById('liveCount').innerText = presentToday;
+    }
+    feed(`${c.user}: ${c.record ? c.record.status + ' ' + (c.record.shift || '') : 'cleared'} on ${c.date}`);
+  }
+});
+live.addEventListener('user', e => {
+  const u = JSON.parse(e.data);
+  if (u.action === 'deleted')
+    document.querySelectorAll('#usersBody tr').forEach(tr => { if (tr.dataset.username === u.user) tr.remove(); });
+  feed(`${u.user} ${u.action}`);
+});
+live.onopen = () => { document.getElementById('liveState').innerText = 'live'; loadHeadcount(); };
+live.onerror = () => { document.getElementById('liveState').innerText = 'reconnecting\u2026'; };
+
+let searchTimer = null;
+document.getElementById('userSearch').addEventListener('input', () => {
+  clearTimeout(searchTimer); searchTimer = setTimeout(() => loadUsers(), 250);
+});
+document.getElementById('searchBy').addEventListener('change', () => loadUsers());
+document.getElementById('moreBtn').addEventListener('click', () => loadUsers(true));
 loadUsers();
 </script>
 </body></html>
 """
 
+# Registered once with a DictLoader: Jinja compiles each template on first
+# use and keeps it in its cache, instead of render_template_string() going
+# through from_string() (a full compile) on every request. With
+# TEMPLATE_BYTECODE_DIR set, compiled bytecode is also kept on disk so a
+# fresh process skips the compile (`flask compile-templates` fills it).
+TEMPLATES = {"login.html": LOGIN_HTML, "main.html": MAIN_HTML, "admin.html": ADMIN_HTML}
+app.jinja_options = dict(app.jinja_options, loader=DictLoader(TEMPLATES))
+if TEMPLATE_BYTECODE_DIR:
+    os.makedirs(TEMPLATE_BYTECODE_DIR, exist_ok=True)
+    app.jinja_options["bytecode_cache"] = FileSystemBytecodeCache(TEMPLATE_BYTECODE_DIR)
+
 # ---------------------------
 # Utilities: JWT helpers and auth decorator
 # ---------------------------
 def create_jwt(payload, exp_seconds=JWT_EXP_SECONDS):
     payload = payload.copy()
-    payload["exp"] = int(time.time()) + int(exp_seconds)
+    payload["iat"] = int(time.time())
+    payload["exp"] = payload["iat"] + int(exp_seconds)
+    import jwt  # PyJWT
     return jwt.encode(payload, app.config["SECRET_KEY"], algorithm=JWT_ALGORITHM)
 
 def decode_jwt(token):
+    import jwt
     try:
         return jwt.decode(token, app.config["SECRET_KEY"], algorithms=[JWT_ALGORITHM])
     except Exception:
         return None
 
+class TokenCache:
+    """Bounded LRU of already-verified session tokens -> payload.
+
+    Entries expire after `ttl` seconds or at the token's own exp, whichever
+    is sooner, so a hit skips the HMAC check and claim validation without
+    ever accepting an expired token. It only caches the signature check:
+    the user is still looked up on every request, so deleted users and
+    revoked sessions are refused immediately in every worker.
+    """
+
+    def __init__(self, size, ttl):
+        self.size, self.ttl = size, ttl
+        self._entries = OrderedDict()  # token -> (payload, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        now = time.time()
+        with self._lock:
+            hit = self._entries.get(token)
+            if hit is None:
+                return None
+            if hit[1] <= now:
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return hit[0]
+
+    def put(self, token, payload):
+        expires = min(time.time() + self.ttl, payload.get("exp", 0))
+        with self._lock:
+            self._entries[token] = (payload, expires)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def revoke_user(self, username):
+        with self._lock:
+            for token in [t for t, (p, _) in self._entries.items() if p.get("sub") == username]:
+                del self._entries[token]
+
+token_cache = TokenCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+
+def verify_session(token):
+    """Payload of a valid session token (not a reset token), or None."""
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = decode_jwt(token)
+        if not payload or payload.get("purpose"):
+            return None
+        token_cache.put(token, payload)
+    return payload
+
 def get_token_from_request():
     # Try cookie first, then Authorization header
     token = request.cookies.get("token")
@@ -481,44 +2194,511 @@ def get_token_from_request():
         return auth.split(" ", 1)[1]
     return None
 
+def authenticate():
+    """(username, payload, user_obj) for the request, or an error response.
+
+    A session is refused when its user no longer exists or the token was
+    issued before the user's "sessions_after" mark (set when the account is
+    created and when its password is reset), so a token never outlives a
+    delete/re-register or a password change.
+    """
+    token = get_token_from_request()
+    if not token:
+        return None, (jsonify({"error":"Authentication required"}), 401)
+    with phase("auth"):
+        payload = verify_session(token)
+    if not payload:
+        return None, (jsonify({"error":"Invalid or expired token"}), 401)
+    username = payload.get("sub")
+    user = store.get_user(username)
+    if not user or payload.get("iat", 0) < user.get("sessions_after", 0):
+        return None, (jsonify({"error":"Invalid session"}), 401)
+    return (username, payload, user), None
+
 def require_auth(f):
     @wraps(f)
     def wrapped(*args, **kwargs):
-        token = get_token_from_request()
-        if not token:
-            return jsonify({"error":"Authentication required"}), 401
-        payload = decode_jwt(token)
-        if not payload:
-            return jsonify({"error":"Invalid or expired token"}), 401
-        username = payload.get("sub")
-        data = read_data()
-        if username not in data:
-            return jsonify({"error":"Invalid session"}), 401
-        # attach user info to request context via kwargs
-        kwargs["_auth_user"] = username
-        kwargs["_auth_payload"] = payload
+        auth, err = authenticate()
+        if err:
+            return err
+        # attach user info to request context via kwargs; routes use
+        # _auth_obj instead of looking the user up again
+        kwargs["_auth_user"], kwargs["_auth_payload"], kwargs["_auth_obj"] = auth
         return f(*args, **kwargs)
     return wrapped
 
 def require_admin(f):
     @wraps(f)
     def wrapped(*args, **kwargs):
-        token = get_token_from_request()
-        if not token:
-            return jsonify({"error":"Authentication required"}), 401
-        payload = decode_jwt(token)
-        if not payload:
-            return jsonify({"error":"Invalid or expired token"}), 401
-        username = payload.get("sub")
-        data = read_data()
-        user = data.get(username)
-        if not user or not user.get("is_admin"):
+        auth, err = authenticate()
+        if err:
+            return err
+        if not auth[2].get("is_admin"):
             return jsonify({"error":"Admin access required"}), 403
-        kwargs["_auth_user"] = username
-        kwargs["_auth_payload"] = payload
+        kwargs["_auth_user"], kwargs["_auth_payload"], kwargs["_auth_obj"] = auth
         return f(*args, **kwargs)
     return wrapped
 
+# ---------------------------
+# Password hashing on a bounded worker pool + login throttling
+# ---------------------------
+class KDFBusy(Exception):
+    """Every KDF worker is busy and the wait queue is full."""
+
+class KDFPool:
+    """Runs password hashing/verification on `workers` dedicated threads.
+
+    At most `workers + max_queue` jobs are admitted at once; anything more
+    is refused straight away (KDFBusy -> 503) rather than letting a login
+    rush tie up every request thread in key derivation.
+    """
+
+    def __init__(self, workers, max_queue):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kdf")
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise KDFBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+kdf_pool = KDFPool(KDF_WORKERS, KDF_MAX_QUEUE)
+
+def hash_password(passwd):
+    from werkzeug.security import generate_password_hash
+    with phase("kdf"):
+        return kdf_pool.run(generate_password_hash, passwd, PASSWORD_HASH_METHOD)
+
+def verify_password(stored, passwd):
+    from werkzeug.security import check_password_hash
+    with phase("kdf"):
+        return kdf_pool.run(check_password_hash, stored, passwd)
+
+def needs_rehash(stored):
+    # werkzeug hashes look like "<method>$<salt>$<hash>"
+    return stored.split("$", 1)[0] != PASSWORD_HASH_METHOD
+
+@app.errorhandler(KDFBusy)
+def kdf_busy(_e):
+    resp = jsonify({"error":"Server busy, please retry"})
+    resp.headers["Retry-After"] = "1"
+    return resp, 503
+
+class RateLimiter:
+    """Token buckets per key: `burst` attempts, refilled one per `per` seconds.
+
+    Buckets that have refilled completely carry no state and are pruned
+    once the table grows past `max_keys`.
+    """
+
+    def __init__(self, burst, per, max_keys=100000):
+        self.burst, self.per, self.max_keys = burst, per, max_keys
+        self._buckets = {}  # key -> (tokens, last_update)
+        self._lock = threading.Lock()
+
+    def _level(self, key, now):
+        tokens, last = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - last) / self.per)
+
+    def hit(self, key):
+        """Take one token; returns 0 if allowed, else seconds until the next one."""
+        now = time.monotonic()
+        with self._lock:
+            tokens = self._level(key, now)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return (1 - tokens) * self.per
+            self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self.max_keys:
+                for k in [k for k in self._buckets if self._level(k, now) >= self.burst]:
+                    del self._buckets[k]
+            return 0
+
+login_user_limiter = RateLimiter(*LOGIN_LIMIT_PER_USER)
+login_ip_limiter = RateLimiter(*LOGIN_LIMIT_PER_IP)
+if PROXY_HOPS:
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_HOPS, x_proto=PROXY_HOPS)
+
+def client_ip():
+    # the socket peer, which ProxyFix has already replaced with the
+    # forwarded client address when ATTENDANCE_PROXY_HOPS says to trust it
+    return request.remote_addr
+
+def throttled(retry_after):
+    resp = jsonify({"error":"Too many attempts, try again later"})
+    resp.headers["Retry-After"] = str(int(retry_after) + 1)
+    return resp, 429
+
+def encode_cursor(position):
+    return base64.urlsafe_b64encode(json.dumps(list(position)).encode()).decode()
+
+def decode_cursor(cursor):
+    """Position from an opaque cursor (None for the first page); ValueError if mangled."""
+    if not cursor:
+        return None
+    try:
+        key, name = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(key), str(name)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+def etag_response(parts, build):
+    """JSON response for build() under a strong ETag derived from `parts`.
+
+    `parts` must identify the payload exactly (store/user revisions plus
+    whatever query args shape it), so a matching If-None-Match gets a 304
+    without build() - and the storage reads behind it - ever running.
+    """
+    etag = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    if request.if_none_match.contains(etag):
+        resp = make_response("", 304)
+    else:
+        resp = jsonify(build())
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+# ---------------------------
+# Request metrics: per-route latency and phase histograms (this process only)
+# ---------------------------
+class Histogram:
+    """Cumulative-bucket latency histogram in seconds, Prometheus style."""
+
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)  # last slot: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}  # (route, method, status) -> Histogram
+        self.phases = {}    # (route, phase) -> Histogram
+
+    def record(self, route, method, status, total, phases):
+        with self._lock:
+            key = (route, method, str(status))
+            (self.requests.get(key) or self.requests.setdefault(key, Histogram())).observe(total)
+            for name, seconds in phases.items():
+                key = (route, name)
+                (self.phases.get(key) or self.phases.setdefault(key, Histogram())).observe(seconds)
+
+    def render(self):
+        """Prometheus text exposition format (0.0.4)."""
+        def label(v):
+            return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        def series(out, name, label_names, table):
+            for key, h in sorted(table.items()):
+                labels = ",".join(f'{n}="{label(v)}"' for n, v in zip(label_names, key))
+                running = 0
+                for le, n in zip(Histogram.BUCKETS + ("+Inf",), h.counts):
+                    running += n
+                    out.append(f'{name}_bucket{{{labels},le="{le}"}} {running}')
+                out.append(f"{name}_sum{{{labels}}} {h.sum:.6f}")
+                out.append(f"{name}_count{{{labels}}} {h.count}")
+        out = []
+        with self._lock:
+            out += ["# HELP attendance_request_duration_seconds Time from request start to response, by route.",
+                    "# TYPE attendance_request_duration_seconds histogram"]
+            series(out, "attendance_request_duration_seconds", ("route", "method", "status"), self.requests)
+            out += ["# HELP attendance_phase_duration_seconds Time spent per request in each phase, by route.",
+                    "# TYPE attendance_phase_duration_seconds histogram"]
+            series(out, "attendance_phase_duration_seconds", ("route", "phase"), self.phases)
+        return "\n".join(out) + "\n"
+
+metrics = Metrics()
+
+@app.before_request
+def _start_timer():
+    g.started = time.perf_counter()
+    g.phases = {}
+
+def _render_started(sender, template, context, **extra):
+    g.render_started = time.perf_counter()
+
+def _render_done(sender, template, context, **extra):
+    started = g.pop("render_started", None)
+    if started is not None and "phases" in g:
+        g.phases["render"] = g.phases.get("render", 0.0) + time.perf_counter() - started
+
+before_render_template.connect(_render_started, app)
+template_rendered.connect(_render_done, app)
+
+@app.after_request
+def _record_timing(resp):
+    # streamed bodies (exports, ndjson) are produced after this point, so
+    # for those this is the time to the first byte
+    started = g.get("started")
+    if started is None:
+        return resp
+    total = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule else "<unmatched>"
+    metrics.record(route, request.method, resp.status_code, total, g.phases)
+    if SERVER_TIMING:
+        resp.headers["Server-Timing"] = ", ".join(
+            [f"{name};dur={seconds * 1000:.2f}" for name, seconds in g.phases.items()] +
+            [f"total;dur={total * 1000:.2f}"])
+    if total * 1000 >= SLOW_REQUEST_MS:
+        app.logger.warning("slow request: %s %s -> %s in %.1f ms (%s)", request.method, request.path,
+                           resp.status_code, total * 1000,
+                           ", ".join(f"{n}={s * 1000:.1f}ms" for n, s in g.phases.items()) or "no phases")
+    return resp
+
+@app.route("/metrics")
+@require_admin
+def metrics_endpoint(_auth_user=None, _auth_payload=None, _auth_obj=None):
+    return app.response_class(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# ---------------------------
+# Opt-in request profiling: cProfile (.pstats) + sampled stacks (.collapsed)
+# ---------------------------
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack every `interval` seconds and counts
+    each distinct stack, in the folded "outer;...;inner count" format that
+    flamegraph.pl and speedscope read. Frames carry their line numbers."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id, self.interval = thread_id, interval
+        self.stacks = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def collapsed(self):
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+def profile_requested():
+    if request.headers.get("X-Profile") == "1" or request.args.get("_profile") == "1":
+        auth, err = authenticate()
+        return not err and bool(auth[2].get("is_admin"))
+    return PROFILE_RATE > 0 and random.random() < PROFILE_RATE
+
+def save_profile(profiler, sampler, elapsed):
+    route = request.url_rule.rule if request.url_rule else request.path
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{request.method}-{slug}-{elapsed * 1000:.0f}ms"
+    directory = Path(PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(directory / f"{name}.pstats")
+    atomic_write(directory / f"{name}.collapsed", sampler.collapsed())
+    # keep the newest PROFILE_KEEP pairs
+    old = sorted(directory.glob("*.pstats"), key=lambda f: f.stat().st_mtime)[:-PROFILE_KEEP]
+    for f in old:
+        f.unlink(missing_ok=True)
+        f.with_suffix(".collapsed").unlink(missing_ok=True)
+    return name
+
+_profile_lock = threading.Lock()  # held by the request being profiled
+
+def _start_profile():
+    # on Python 3.12+ cProfile is process-wide and a second enable() raises
+    # ValueError, so one request is profiled at a time and any request that
+    # overlaps it (or another profiling tool) is served unprofiled
+    if not profile_requested() or not _profile_lock.acquire(blocking=False):
+        return
+    import cProfile
+    profiler, sampler = cProfile.Profile(), StackSampler(threading.get_ident(), PROFILE_INTERVAL)
+    sampler.start()
+    try:
+        profiler.enable()
+    except ValueError:
+        sampler.stop()
+        _profile_lock.release()
+        return
+    g.profile = (profiler, sampler, time.perf_counter())
+
+def _end_profile(prof):
+    prof[0].disable()
+    prof[1].stop()
+    _profile_lock.release()
+
+def _save_profile(resp):
+    prof = g.pop("profile", None)
+    if prof:
+        _end_profile(prof)
+        resp.headers["X-Profile-Id"] = save_profile(prof[0], prof[1], time.perf_counter() - prof[2])
+    return resp
+
+def _stop_profile(exc):
+    prof = g.pop("profile", None)
+    if prof:  # the request failed before after_request ran
+        _end_profile(prof)
+
+if PROFILE_DIR:
+    # registered only when enabled, so a disabled profiler costs nothing
+    app.before_request(_start_profile)
+    app.after_request(_save_profile)
+    app.teardown_request(_stop_profile)
+
+def profile_file(name):
+    path = Path(PROFILE_DIR) / name
+    return path if path.suffix in (".pstats", ".collapsed") and path.is_file() else None
+
+@app.route("/api/admin/profiles")
+@require_admin
+def api_admin_profiles(_auth_user=None, _auth_payload=None, _auth_obj=None):
+    if not PROFILE_DIR:
+        return jsonify({"error":"Profiling is disabled (set ATTENDANCE_PROFILE_DIR)"}), 404
+    out = []
+    for f in sorted(Path(PROFILE_DIR).glob("*.pstats"), key=lambda f: f.stat().st_mtime, reverse=True):
+        st = f.stat()
+        out.append({"id": f.stem, "created": int(st.st_mtime), "size": st.st_size,
+                     "files": [f.name] + ([f.stem + ".collapsed"] if f.with_suffix(".collapsed").exists() else [])})
+    return jsonify({"profiles": out})
+
+@app.route("/api/admin/profiles/<name>")
+@require_admin
+def api_admin_profile_file(name, _auth_user=None, _auth_payload=None, _auth_obj=None):
+    if not PROFILE_DIR:
+        return jsonify({"error":"Profiling is disabled (set ATTENDANCE_PROFILE_DIR)"}), 404
+    if not profile_file(name):
+        return jsonify({"error":"Not found"}), 404
+    return send_from_directory(PROFILE_DIR, name, as_attachment=True)
+
+# ---------------------------
+# Live admin feed: in-process pub/sub streamed as server-sent events
+# ---------------------------
+class Subscription:
+    """One listener's bounded queue of formatted SSE chunks."""
+
+    def __init__(self, size):
+        self.size = size
+        self.dropped = False
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def offer(self, chunk):
+        with self._cond:
+            if len(self._items) >= self.size:
+                self.dropped = True
+            else:
+                self._items.append(chunk)
+            self._cond.notify()
+            return not self.dropped
+
+    def get(self, timeout):
+        """Next chunk, "" if none arrived within `timeout`, None once dropped."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._items or self.dropped, timeout)
+            if self.dropped:
+                return None
+            return self._items.popleft() if self._items else ""
+
+class EventHub:
+    """Fan-out of events to the SSE listeners in this worker.
+
+    publish() never blocks the request that writes: each event is
+    formatted once and offered to every listener's bounded queue, and a
+    listener whose queue is full is dropped - its stream ends and the
+    browser reconnects and starts over, rather than the writer waiting on
+    a slow consumer. Events only reach listeners on the same worker.
+    """
+
+    def __init__(self, queue_size, max_listeners):
+        self.queue_size = queue_size
+        self.max_listeners = max_listeners
+        self._subs = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.dropped = 0
+
+    def watched(self):
+        return bool(self._subs)
+
+    def subscribe(self, make=Subscription):
+        """A new make(queue_size) subscription, or None when at max_listeners."""
+        with self._lock:
+            if len(self._subs) >= self.max_listeners:
+                return None
+            sub = make(self.queue_size)
+            self._subs.add(sub)
+            return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subs.discard(sub)
+
+    def publish(self, kind, data):
+        if not self._subs:
+            return
+        chunk = f"id: {next(self._ids)}\nevent: {kind}\ndata: {json.dumps(data, default=json_default)}\n\n"
+        with self._lock:
+            subs = list(self._subs)
+        for sub in subs:
+            if not sub.offer(chunk):
+                self.unsubscribe(sub)
+                self.dropped += 1
+
+events = EventHub(EVENTS_QUEUE_SIZE, EVENTS_MAX_LISTENERS)
+
+def live_attendance(items, write):
+    """Run write() for (username, day_iso, rec or None) items and, if anyone
+    is listening and it wrote something, publish them together with the
+    records they replaced."""
+    if not events.watched():
+        return write()
+    previous = [store.get_day(u, d) for u, d, _ in items]
+    result = write()
+    if result is not False:
+        events.publish("attendance", {"changes": [{"user": u, "date": d, "record": r, "previous": p}
+                                                  for (u, d, r), p in zip(items, previous)]})
+    return result
+
+@app.route("/api/admin/events")
+@require_admin
+def api_admin_events(_auth_user=None, _auth_payload=None, _auth_obj=None):
+    # "attendance" ({"changes": [{user, date, record, previous}]}) and "user"
+    # ({user, action: registered/deleted}) events; "dropped" just before the
+    # stream ends for a listener that fell too far behind
+    sub = events.subscribe()
+    if sub is None:
+        resp = jsonify({"error":"Too many live listeners"})
+        resp.headers["Retry-After"] = "30"
+        return resp, 503
+    def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                chunk = sub.get(EVENTS_HEARTBEAT)
+                if chunk is None:
+                    yield "event: dropped\ndata: {}\n\n"
+                    return
+                yield chunk or ": keepalive\n\n"
+        finally:
+            events.unsubscribe(sub)
+    resp = app.response_class(stream(), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-store"
+    resp.headers["X-Accel-Buffering"] = "no"  # nginx: don't buffer the stream
+    return resp
+
 # ---------------------------
 # ROUTES: Login/Register pages and APIs
 # ---------------------------
@@ -526,9 +2706,9 @@ def require_admin(f):
 def login_page():
     # if logged in, redirect to app
     token = get_token_from_request()
-    if token and decode_jwt(token):
+    if token and verify_session(token):
         return redirect("/")
-    return render_template_string(LOGIN_HTML)
+    return render_template("login.html")
 
 @app.route("/logout")
 def logout():
@@ -545,17 +2725,20 @@ def api_register():
     is_admin = bool(payload.get("admin"))
     if not (name and user and passwd):
         return jsonify({"error":"Missing fields"}), 400
-    data = read_data()
-    if user in data:
+    wait = login_ip_limiter.hit(client_ip())
+    if wait:
+        return throttled(wait)
+    if store.has_user(user):
         return jsonify({"error":"Username already exists"}), 409
     # create user
-    data[user] = {
+    store.put_user(user, {
         "name": name,
-        "password": generate_password_hash(passwd),
+        "password": hash_password(passwd),
         "is_admin": bool(is_admin),
+        "sessions_after": int(time.time()),
         "attendance": {}
-    }
-    write_data(data)
+    })
+    events.publish("user", {"user": user, "name": name, "action": "registered"})
     return jsonify({"ok": True})
 
 @app.route("/api/login", methods=["POST"])
@@ -565,13 +2748,19 @@ def api_login():
     passwd = (payload.get("pass") or "").strip()
     if not (user and passwd):
         return jsonify({"error":"Missing credentials"}), 400
-    data = read_data()
-    user_obj = data.get(user)
+    # throttle before any key derivation happens
+    wait = max(login_ip_limiter.hit(client_ip()), login_user_limiter.hit(user))
+    if wait:
+        return throttled(wait)
+    user_obj = store.get_user(user)
     if not user_obj:
         return jsonify({"error":"Invalid username or password"}), 401
     stored = user_obj.get("password")
-    if not stored or not check_password_hash(stored, passwd):
+    if not stored or not verify_password(stored, passwd):
         return jsonify({"error":"Invalid username or password"}), 401
+    if needs_rehash(stored):
+        # transparently move the hash to the configured method/cost
+        store.update_user(user, password=hash_password(passwd))
     # create JWT
     token = create_jwt({"sub": user})
     resp = make_response(jsonify({"ok": True, "name": user_obj.get("name","")}))
@@ -588,14 +2777,13 @@ def api_forgot():
     user = (payload.get("user") or "").strip()
     if not user:
         return jsonify({"error":"Missing username"}), 400
-    data = read_data()
-    if user not in data:
+    user_obj = store.get_user(user)
+    if not user_obj:
         return jsonify({"error":"User not found"}), 404
     # create a short-lived reset token (JWT with purpose 'reset' and username)
     reset_token = create_jwt({"sub": user, "purpose": "reset"}, exp_seconds=RESET_EXP_SECONDS)
     # store token info optionally
-    data[user]["reset_token"] = {"token": reset_token, "exp": int(time.time()) + RESET_EXP_SECONDS}
-    write_data(data)
+    store.update_user(user, reset_token={"token": reset_token, "exp": int(time.time()) + RESET_EXP_SECONDS})
     # In production: email the reset link. Here we return the link for testing.
     reset_link = request.url_root.rstrip("/") + url_for("reset_password_page", token=reset_token)
     return jsonify({"ok": True, "reset_link": reset_link})
@@ -621,18 +2809,15 @@ def reset_password_page(token):
     newpw = (request.form.get("password") or "").strip()
     if not newpw:
         return "Missing password", 400
-    data = read_data()
-    user_obj = data.get(username)
+    user_obj = store.get_user(username)
     if not user_obj:
         return "User not found", 404
     # optional: check stored reset token matches token (prevents reuse if overwritten)
     stored = user_obj.get("reset_token", {}).get("token")
     if stored and stored != token:
         return "Reset token mismatch", 400
-    user_obj["password"] = generate_password_hash(newpw)
-    # delete reset token
-    user_obj.pop("reset_token", None)
-    write_data(data)
+    # a new password also ends every existing session; the reset token goes
+    store.update_user(username, password=hash_password(newpw), sessions_after=int(time.time()), reset_token=None)
     return f"Password updated for {username}. You may now <a href='/login'>login</a>."
 
 # ---------------------------
@@ -640,193 +2825,930 @@ def reset_password_page(token):
 # ---------------------------
 @app.route("/")
 @require_auth
-def index(_auth_user=None, _auth_payload=None):
-    current_user = _auth_user
-    data = read_data()
-    user_obj = data.get(current_user, {"name": "", "attendance": {}})
-    attend = user_obj.get("attendance", {})
+def index(_auth_user=None, _auth_payload=None, _auth_obj=None):
+    # page shell only - calendar.js fetches the cycle from /api/calendar.
+    # It depends on nothing but the user's name/role, so revisits and
+    # month changes revalidate with the ETag instead of re-downloading it.
+    user_obj = _auth_obj
+    resp = make_response(render_template("main.html",
+        current_name=user_obj.get("name",""), is_admin=user_obj.get("is_admin", False)))
+    resp.add_etag()
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp.make_conditional(request)
 
+def requested_cycle():
+    """(year, month) from the query string, defaulting to today's month."""
     today = date.today()
     year = request.args.get("year", today.year, type=int)
     month = request.args.get("month", today.month, type=int)
+    if not 1 <= month <= 12 or not 1 < year <= 9999:
+        return None
+    return year, month
 
-    # Attendance cycle: 26 prev month → 25 current
-    if month == 1:
-        prev_month, prev_year = 12, year - 1
-    else:
-        prev_month, prev_year = month - 1, year
-
-    start_date = date(prev_year, prev_month, 26)
-    end_date = date(year, month, 25)
-    raw_days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
-    first_weekday = raw_days[0].weekday()
-    padding = (first_weekday + 1) % 7
-    days = [None] * padding + raw_days
-    weeks = [days[i:i + 7] for i in range(0, len(days), 7)]
-
-    # Prepare summary
-    total_present = total_absent = 0
-    total_ot_hours = 0.0
-    shift_dates = {}
-
-    for iso, rec in attend.items():
-        try:
-            d = datetime.fromisoformat(iso).date()
-        except Exception:
-            continue
-        if not (start_date <= d <= end_date):
-            continue
-        status = rec.get("status", "")
-        if status == "Present":
-            total_present += 1
-            try:
-                total_ot_hours += float(rec.get("ot_hours", 0) or 0)
-            except Exception:
-                pass
-        elif status == "Absent":
-            total_absent += 1
-
-        sh = (rec.get("shift") or "").strip()
-        if status == "Present" and sh and sh != "GEN":
-            shift_dates.setdefault(sh, []).append(d.day)
-
-    shift_line = make_shift_line(shift_dates)
-    total_ot_hours = round(total_ot_hours, 1)
+def cycle_summary(user, year, month):
+    totals = store.cycle_totals(user, year, month)
+    return {"present": totals["present"], "absent": totals["absent"],
+            "ot_hours": round(totals["ot_hours"], 1), "shift_line": make_shift_line(totals["shifts"])}
 
-    return render_template_string(MAIN_HTML, year=year, month=month, weeks=weeks,
-        attendance=attend, calendar=calendar, today=today,
-        total_present=total_present, total_absent=total_absent,
-        total_ot_hours=total_ot_hours, shift_line=shift_line,
-        current_name=user_obj.get("name",""), is_admin=user_obj.get("is_admin", False))
+@app.route("/api/calendar")
+@require_auth
+def api_calendar(_auth_user=None, _auth_payload=None, _auth_obj=None):
+    # one attendance cycle (26 prev month → 25 current): bounds, the
+    # records that exist and the summary - the client lays out the days
+    cyc = requested_cycle()
+    if not cyc:
+        return jsonify({"error":"Invalid year/month"}), 400
+    year, month = cyc
+    start_date, end_date = cycle_bounds(year, month)
+    today = date.today()
+    def build():
+        import calendar
+        records = store.attendance_range(_auth_user, start_date.isoformat(), end_date.isoformat())
+        return {"year": year, "month": month, "label": f"{calendar.month_name[month]} {year}",
+                "start": start_date.isoformat(), "end": end_date.isoformat(),
+                "today": today.isoformat(), "records": records,
+                "summary": cycle_summary(_auth_user, year, month)}
+    return etag_response(("calendar", _auth_user, _auth_obj.get("rev", 0), year, month, today), build)
 
 # ---------------------------
 # API endpoints for attendance (per-user)
 # ---------------------------
 @app.route("/attendance/<day_iso>")
 @require_auth
-def get_attendance(day_iso, _auth_user=None, _auth_payload=None):
+def get_attendance(day_iso, _auth_user=None, _auth_payload=None, _auth_obj=None):
     user = _auth_user
-    data = read_data()
-    rec = data.get(user, {}).get("attendance", {}).get(day_iso, {})
-    return jsonify(rec)
+    return etag_response(("day", user, _auth_obj.get("rev", 0), day_iso), lambda: store.get_day(user, day_iso) or {})
 
 @app.route("/attendance/<day_iso>", methods=["DELETE"])
 @require_auth
-def delete_attendance(day_iso, _auth_user=None, _auth_payload=None):
+def delete_attendance(day_iso, _auth_user=None, _auth_payload=None, _auth_obj=None):
     user = _auth_user
-    data = read_data()
-    user_obj = data.get(user)
-    if not user_obj:
-        return jsonify({"error":"Not found"}), 404
-    daymap = user_obj.setdefault("attendance", {})
-    if day_iso in daymap:
-        del daymap[day_iso]
-        write_data(data)
+    if live_attendance([(user, day_iso, None)], lambda: store.delete_day(user, day_iso)):
         return jsonify({"ok": True})
     return jsonify({"error":"Not found"}), 404
 
 @app.route("/attendance", methods=["POST"])
 @require_auth
-def save_attendance(_auth_user=None, _auth_payload=None):
+def save_attendance(_auth_user=None, _auth_payload=None, _auth_obj=None):
     user = _auth_user
     rec = request.get_json(force=True)
-    day = rec.get("date")
-    if not day:
+    if not rec.get("date"):
         return jsonify({"error":"Missing date"}), 400
-    data = read_data()
-    user_obj = data.setdefault(user, {"name": request.args.get("name",""), "password": generate_password_hash("temp"), "is_admin": False, "attendance": {}})
-    user_obj.setdefault("attendance", {})
     try:
-        ot = float(rec.get("ot_hours", 0) or 0)
-    except:
-        ot = 0.0
-    user_obj["attendance"][day] = {"shift": rec.get("shift"), "status": rec.get("status"), "ot_hours": ot}
-    write_data(data)
+        day = date.fromisoformat(str(rec["date"])).isoformat()
+    except ValueError:
+        return jsonify({"error":"Invalid date"}), 400
+    rec = make_record(rec)
+    if not live_attendance([(user, day, rec)], lambda: store.put_day(user, day, rec)):
+        return jsonify({"error":"Invalid session"}), 401
     return jsonify({"ok": True})
 
+@app.route("/attendance/bulk", methods=["POST"])
+@require_auth
+def save_attendance_bulk(_auth_user=None, _auth_payload=None, _auth_obj=None):
+    # [{date, shift, status, ot_hours}, ...] -> validated, then one storage commit
+    entries, err = bulk_entries()
+    if err:
+        return err
+    results, items = [], []
+    for i, entry in enumerate(entries):
+        try:
+            day, rec = validate_entry(entry)
+        except ValueError as e:
+            results.append({"index": i, "ok": False, "error": str(e)})
+            continue
+        items.append((_auth_user, day, rec))
+        results.append({"index": i, "ok": True, "date": day})
+    if items:
+        live_attendance(items, lambda: store.put_days(items))
+    return jsonify({"ok": len(items) == len(entries), "saved": len(items), "results": results})
+
 @app.route("/summary")
 @require_auth
-def summary(_auth_user=None, _auth_payload=None):
-    user = _auth_user
-    data = read_data()
-    user_obj = data.get(user, {})
-    records = user_obj.get("attendance", {})
-    present = absent = 0
-    ot_hours = 0.0
-    shift_dates = {}
-    for day, rec in records.items():
-        st = rec.get("status")
-        if st == "Present":
-            present += 1
-            try:
-                ot_hours += float(rec.get("ot_hours") or 0)
-            except:
-                pass
-        elif st == "Absent":
-            absent += 1
-        sh = (rec.get("shift") or "").strip()
-        if st == "Present" and sh and sh != "GEN":
-            try:
-                d = datetime.fromisoformat(day).day
-                shift_dates.setdefault(sh, []).append(d)
-            except:
-                pass
-    shift_line = make_shift_line(shift_dates)
-    return jsonify({"present": present, "absent": absent, "ot_hours": round(ot_hours, 1), "shift_line": shift_line})
+def summary(_auth_user=None, _auth_payload=None, _auth_obj=None):
+    # totals for one 26th-25th cycle (default: the one index() shows first)
+    cyc = requested_cycle()
+    if not cyc:
+        return jsonify({"error":"Invalid year/month"}), 400
+    year, month = cyc
+    return etag_response(("summary", _auth_user, _auth_obj.get("rev", 0), year, month),
+                         lambda: dict(cycle_summary(_auth_user, year, month), year=year, month=month))
+
+# ---------------------------
+# Delta sync: attendance changes since a revision
+# ---------------------------
+@app.route("/api/changes")
+@require_auth
+def api_changes(_auth_user=None, _auth_payload=None, _auth_obj=None):
+    # ?since=<rev> -> the user's records written or deleted after it, oldest
+    # first, and the rev to ask from next time; admins get every user's
+    # with ?all=1. Without since, only the current rev: take it before a
+    # full load and sync from it. 410 means the log no longer reaches back
+    # that far (or was reset): reload, then continue from its "rev". 404
+    # unless the change log is on (ATTENDANCE_CHANGES_LOG).
+    if not CHANGES_LOG:
+        return jsonify({"error":"Change log is off"}), 404
+    since = request.args.get("since", type=int)
+    if since is not None and since < 0:
+        return jsonify({"error":"Invalid since"}), 400
+    everyone = request.args.get("all") == "1"
+    if everyone and not _auth_obj.get("is_admin"):
+        return jsonify({"error":"Admin only"}), 403
+    limit = min(max(request.args.get("limit", CHANGES_PAGE_SIZE, type=int), 1), CHANGES_PAGE_MAX)
+    if since is None:
+        resp = jsonify({"rev": store.change_rev(), "changes": [], "more": False})
+        resp.headers["Cache-Control"] = "no-store"
+        return resp
+    horizon, latest, rows, more = store.changes_since(since, None if everyone else _auth_user, limit)
+    if since < horizon or since > latest:
+        return jsonify({"error":"Too far behind, reload everything", "rev": latest}), 410
+    changes = []
+    for rev, user, day, deleted in rows:
+        change = {"rev": rev}
+        if everyone:
+            change["user"] = user
+        if day is None:
+            change["deleted"] = True  # the user, and with it all of its records
+        else:
+            rec = None if deleted else store.get_day(user, day)
+            change["date"] = day
+            if rec is None:
+                change["deleted"] = True
+            else:
+                change["record"] = rec
+        changes.append(change)
+    resp = jsonify({"rev": changes[-1]["rev"] if more else latest, "changes": changes, "more": more})
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
 
 # ---------------------------
 # Admin dashboard & APIs
 # ---------------------------
 @app.route("/admin")
 @require_admin
-def admin_page(_auth_user=None, _auth_payload=None):
-    data = read_data()
-    name = data.get(_auth_user, {}).get("name", "")
-    return render_template_string(ADMIN_HTML, current_name=name)
+def admin_page(_auth_user=None, _auth_payload=None, _auth_obj=None):
+    name = _auth_obj.get("name", "")
+    return render_template("admin.html", current_name=name)
 
 @app.route("/api/admin/users")
 @require_admin
-def api_admin_users(_auth_user=None, _auth_payload=None):
-    data = read_data()
-    users = []
-    for uname, obj in data.items():
-        users.append({"username": uname, "name": obj.get("name"), "is_admin": bool(obj.get("is_admin", False))})
-    return jsonify({"users": users})
+def api_admin_users(_auth_user=None, _auth_payload=None, _auth_obj=None):
+    # ?q= prefix on username (or name with by=name), ?limit= page size,
+    # ?cursor= from the previous page's next_cursor; format=ndjson streams
+    # every match as one JSON object per line instead
+    by = request.args.get("by", "username")
+    if by not in ("username", "name"):
+        return jsonify({"error":"by must be username or name"}), 400
+    prefix = request.args.get("q", "").strip()
+    try:
+        after = decode_cursor(request.args.get("cursor"))
+    except ValueError:
+        return jsonify({"error":"Invalid cursor"}), 400
+    rows = store.iter_users(prefix, after, by)
+
+    def user_json(uname, obj):
+        return {"username": uname, "name": obj.get("name"), "is_admin": bool(obj.get("is_admin", False))}
+
+    if request.args.get("format") == "ndjson":
+        def stream():
+            for _, uname, obj in rows:
+                yield json.dumps(user_json(uname, obj)) + "\n"
+        return app.response_class(stream_with_context(stream()), mimetype="application/x-ndjson")
+
+    limit = min(max(request.args.get("limit", USERS_PAGE_SIZE, type=int), 1), USERS_PAGE_MAX)
+    def build():
+        page = list(itertools.islice(rows, limit + 1))
+        users = [user_json(uname, obj) for _, uname, obj in page[:limit]]
+        next_cursor = encode_cursor(page[limit - 1][:2]) if len(page) > limit else None
+        return {"users": users, "next_cursor": next_cursor}
+    return etag_response(("users", store.users_version(), by, prefix, after, limit), build)
 
 @app.route("/api/admin/user/<username>")
 @require_admin
-def api_admin_user(username, _auth_user=None, _auth_payload=None):
-    data = read_data()
-    obj = data.get(username)
+def api_admin_user(username, _auth_user=None, _auth_payload=None, _auth_obj=None):
+    obj = store.get_user(username)
     if not obj:
         return jsonify({"error":"Not found"}), 404
-    # don't return password hash
-    out = {k:v for k,v in obj.items() if k != "password"}
-    return jsonify(out)
+    def build():
+        # don't return password hash
+        out = {k:v for k,v in obj.items() if k != "password"}
+        out["attendance"] = store.attendance(username)
+        return out
+    return etag_response(("user", username, obj.get("rev", 0)), build)
+
+@app.route("/api/admin/attendance/bulk", methods=["POST"])
+@require_admin
+def api_admin_attendance_bulk(_auth_user=None, _auth_payload=None, _auth_obj=None):
+    # like /attendance/bulk, but every entry also names its "username"
+    entries, err = bulk_entries()
+    if err:
+        return err
+    results, items = [], []
+    for i, entry in enumerate(entries):
+        try:
+            day, rec = validate_entry(entry)
+            username = entry.get("username")
+            if not isinstance(username, str) or not username or not store.has_user(username):
+                raise ValueError("Unknown username")
+        except ValueError as e:
+            results.append({"index": i, "ok": False, "error": str(e)})
+            continue
+        items.append((username, day, rec))
+        results.append({"index": i, "ok": True, "username": username, "date": day})
+    if items:
+        live_attendance(items, lambda: store.put_days(items))
+    return jsonify({"ok": len(items) == len(entries), "saved": len(items), "results": results})
 
 @app.route("/api/admin/user/<username>", methods=["DELETE"])
 @require_admin
-def api_admin_delete(username, _auth_user=None, _auth_payload=None):
-    data = read_data()
-    if username in data:
-        del data[username]
-        write_data(data)
+def api_admin_delete(username, _auth_user=None, _auth_payload=None, _auth_obj=None):
+    if store.delete_user(username):
+        token_cache.revoke_user(username)
+        events.publish("user", {"user": username, "action": "deleted"})
         return jsonify({"ok": True})
     return jsonify({"error":"Not found"}), 404
 
+# ---------------------------
+# Payroll export: one cycle for every user, streamed as CSV or XLSX
+# ---------------------------
+EXPORT_COLUMNS = ["username", "name", "present", "absent", "ot_hours",
+                  "FS", "SS", "NS", "GEN2", "shifts"]
+EXPORT_CHUNK = 64 * 1024
+
+def export_rows(year, month):
+    # one row per user, in username order; nothing but the current user's
+    # totals is held at a time
+    for _, uname, obj in store.iter_users():
+        totals = store.cycle_totals(uname, year, month, cache=False)
+        shifts = totals["shifts"]
+        yield [uname, obj.get("name") or "", totals["present"], totals["absent"],
+               round(totals["ot_hours"], 1)] + \
+              [" ".join(str(d) for d in sorted(set(shifts.get(s, [])))) for s in ("FS", "SS", "NS", "GEN2")] + \
+              [make_shift_line(shifts, sep="; ")]
+
+def csv_cell(v):
+    # spreadsheets evaluate text starting with = + - @ (or a tab/CR before
+    # one) as a formula - a user named "=HYPERLINK(...)" included; a
+    # leading ' keeps it plain text. The XLSX export writes inline strings,
+    # which are never evaluated
+    if isinstance(v, str) and v.startswith(("=", "+", "-", "@", "\t", "\r")):
+        return "'" + v
+    return v
+
+def csv_stream(rows):
+    import csv
+    buf = io.StringIO()
+    out = csv.writer(buf)
+    out.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        out.writerow([csv_cell(v) for v in row])
+        if buf.tell() >= EXPORT_CHUNK:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+class _ChunkSink:
+    """Write-only file for zipfile: it has no tell()/seek(), so zipfile
+    streams each member with a data descriptor and never seeks back;
+    drain() hands over whatever has been written since the last call."""
+    def __init__(self):
+        self.parts, self.size = [], 0
+    def write(self, b):
+        self.parts.append(bytes(b))
+        self.size += len(b)
+        return len(b)
+    def flush(self):
+        pass
+    def drain(self):
+        out = b"".join(self.parts)
+        self.parts, self.size = [], 0
+        return out
+
+XLSX_PARTS = {
+    "[Content_Types].xml":
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>',
+    "_rels/.rels":
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>',
+    "xl/workbook.xml":
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="{sheet}" sheetId="1" r:id="rId1"/></sheets></workbook>',
+    "xl/_rels/workbook.xml.rels":
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>',
+}
+
+def xlsx_cell(v):
+    if isinstance(v, (int, float)) and not isinstance(v, bool):
+        return f"<c><v>{v}</v></c>"
+    # drop control characters XML 1.0 can't carry
+    text = "".join(ch for ch in str(v) if ch >= " " or ch in "\t\n")
+    from xml.sax.saxutils import escape
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+def xlsx_stream(rows, sheet):
+    # a minimal single-sheet workbook (inline strings, no styles) written
+    # straight into the zip; the sheet is compressed as rows come in
+    import zipfile
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, body in XLSX_PARTS.items():
+            zf.writestr(name, body.replace("{sheet}", sheet))
+        with zf.open("xl/worksheets/sheet1.xml", "w") as ws:
+            ws.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                     b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            for row in itertools.chain([EXPORT_COLUMNS], rows):
+                ws.write(("<row>" + "".join(xlsx_cell(v) for v in row) + "</row>").encode("utf-8"))
+                if sink.size >= EXPORT_CHUNK:
+                    yield sink.drain()
+            ws.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+@app.route("/api/admin/export")
+@require_admin
+def api_admin_export(_auth_user=None, _auth_payload=None, _auth_obj=None):
+    # ?year=&month= picks the 26th-25th cycle (default: current), format=csv|xlsx
+    cyc = requested_cycle()
+    if not cyc:
+        return jsonify({"error":"Invalid year/month"}), 400
+    fmt = request.args.get("format", "csv")
+    if fmt not in ("csv", "xlsx"):
+        return jsonify({"error":"format must be csv or xlsx"}), 400
+    year, month = cyc
+    rows = export_rows(year, month)
+    if fmt == "csv":
+        body, mimetype = csv_stream(rows), "text/csv"
+    else:
+        body = xlsx_stream(rows, f"{year}-{month:02d}")
+        mimetype = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    resp = app.response_class(body, mimetype=mimetype)
+    resp.headers["Content-Disposition"] = f'attachment; filename="attendance-{year}-{month:02d}.{fmt}"'
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+# ---------------------------
+# Org-wide cycle report, users partitioned across worker processes
+# ---------------------------
+REPORT_CHUNKS_PER_WORKER = 4  # smaller slices even out uneven histories
+
+_report_store = None
+
+def _report_init(backend):
+    # each worker opens its own store: lock fds and SQLite connections
+    # inherited over fork must not be shared with the parent
+    global _report_store
+    _report_store = open_store(backend)
+
+def report_partition(usernames, year, month, with_users, st=None):
+    """Aggregates for one slice of users (runs in a worker process):
+    per-day present/absent headcount, OT per shift and per-user totals."""
+    st = st or _report_store
+    start, end = cycle_bounds(year, month)
+    part = {"users": {}, "present": {}, "absent": {}, "ot_by_shift": {}}
+    present, absent, ot_by_shift = part["present"], part["absent"], part["ot_by_shift"]
+    for uname in usernames:
+        totals = empty_totals()
+        for d, r in st.attendance_range(uname, start.isoformat(), end.isoformat()).items():
+            if cycle_of(d) != (year, month):
+                continue
+            add_to_totals(totals, d, r)
+            status = r.get("status", "")
+            if status == "Present":
+                present[d] = present.get(d, 0) + 1
+                shift = (r.get("shift") or "").strip() or "GEN"
+                try:
+                    ot_by_shift[shift] = ot_by_shift.get(shift, 0.0) + float(r.get("ot_hours", 0) or 0)
+                except Exception:
+                    pass
+            elif status == "Absent":
+                absent[d] = absent.get(d, 0) + 1
+        if with_users:
+            part["users"][uname] = {"present": totals["present"], "absent": totals["absent"],
+                                    "ot_hours": totals["ot_hours"]}
+    return part
+
+def merge_report_parts(parts):
+    merged = {"users": {}, "present": {}, "absent": {}, "ot_by_shift": {}}
+    for part in parts:
+        merged["users"].update(part["users"])
+        for key in ("present", "absent", "ot_by_shift"):
+            acc = merged[key]
+            for k, v in part[key].items():
+                acc[k] = acc.get(k, 0) + v
+    return merged
+
+def absentee_rate(present, absent):
+    marked = present + absent
+    return round(absent / marked, 4) if marked else 0.0
+
+def org_report(year, month, workers=None, with_users=False):
+    """Whole-organisation totals for one 26th-25th cycle.
+
+    Users are split into slices and aggregated by a process pool, then the
+    partial sums are merged. With workers=1 (or a single slice) everything
+    runs in this process. SQLite workers read only their own users' rows;
+    the JSON backends load the data file once per worker.
+    """
+    usernames = [uname for _, uname, _ in store.iter_users()]
+    workers = max(1, workers or REPORT_WORKERS)
+    if workers == 1 or len(usernames) < 2:
+        parts = [report_partition(usernames, year, month, with_users, st=store)]
+    else:
+        size = -(-len(usernames) // (workers * REPORT_CHUNKS_PER_WORKER))
+        chunks = [usernames[i:i + size] for i in range(0, len(usernames), size)]
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(min(workers, len(chunks)), initializer=_report_init,
+                                 initargs=(STORAGE_BACKEND,)) as pool:
+            n = len(chunks)
+            parts = list(pool.map(report_partition, chunks, [year] * n, [month] * n, [with_users] * n))
+    merged = merge_report_parts(parts)
+
+    start, end = cycle_bounds(year, month)
+    days = []
+    d = start
+    while d <= end:
+        iso = d.isoformat()
+        p, a = merged["present"].get(iso, 0), merged["absent"].get(iso, 0)
+        days.append({"date": iso, "present": p, "absent": a, "absentee_rate": absentee_rate(p, a)})
+        d += timedelta(days=1)
+    present, absent = sum(merged["present"].values()), sum(merged["absent"].values())
+    report = {"year": year, "month": month, "start": start.isoformat(), "end": end.isoformat(),
+              "users": len(usernames), "present": present, "absent": absent,
+              "absentee_rate": absentee_rate(present, absent),
+              "ot_hours": round(sum(merged["ot_by_shift"].values()), 1),
+              "ot_by_shift": {k: round(v, 1) for k, v in sorted(merged["ot_by_shift"].items())},
+              "days": days}
+    if with_users:
+        report["per_user"] = [
+            {"username": uname, "present": t["present"], "absent": t["absent"],
+             "ot_hours": round(t["ot_hours"], 1), "absentee_rate": absentee_rate(t["present"], t["absent"])}
+            for uname, t in merged["users"].items()]
+    return report
+
+@app.route("/api/admin/report")
+@require_admin
+def api_admin_report(_auth_user=None, _auth_payload=None, _auth_obj=None):
+    # ?year=&month= cycle (default: current); users=1 adds per-user rows.
+    # Aggregated in-process: fan-out is for `flask report`
+    cyc = requested_cycle()
+    if not cyc:
+        return jsonify({"error":"Invalid year/month"}), 400
+    year, month = cyc
+    with_users = request.args.get("users") in ("1", "true")
+    return etag_response(("report", store.version(), year, month, with_users),
+                         lambda: org_report(year, month, workers=1, with_users=with_users))
+
+@app.route("/api/admin/headcount")
+@require_admin
+def api_admin_headcount(_auth_user=None, _auth_payload=None, _auth_obj=None):
+    # ?date= (default: today): one record lookup per user, for the live
+    # panel on /admin, which reloads it on every event-stream (re)connect
+    try:
+        day = date.fromisoformat(request.args.get("date") or date.today().isoformat()).isoformat()
+    except ValueError:
+        return jsonify({"error":"Invalid date"}), 400
+    def build():
+        statuses = Counter((store.get_day(uname, day) or {}).get("status") for _, uname, _ in store.iter_users())
+        present, absent = statuses["Present"], statuses["Absent"]
+        return {"date": day, "present": present, "absent": absent, "absentee_rate": absentee_rate(present, absent)}
+    return etag_response(("headcount", store.version(), day), build)
+
+# ---------------------------
+# Columnar analytics (NumPy): one array per field instead of a dict per record
+# ---------------------------
+PRESENT = STATUS_CODES["Present"]
+ABSENT = STATUS_CODES["Absent"]
+
+class AttendanceColumns:
+    """The records of one date range as parallel arrays: user index (int32),
+    day ordinal (int32), status code (int8), shift code (int8) and OT hours
+    (float32), ~14 bytes per record. Aggregates are NumPy reductions over
+    these arrays rather than Python loops over dicts.
+    """
+
+    def __init__(self, usernames, start, end, user, day, status, shift, ot):
+        self.usernames = usernames
+        self.start, self.end = start, end
+        self.user, self.day, self.status, self.shift, self.ot = user, day, status, shift, ot
+
+    @classmethod
+    def build(cls, st, start, end):
+        # packed records are copied array to array and decoded by table
+        # lookups; only the odd ones are read a record at a time
+        usernames, counts = [], []
+        days, codes, ots = array("i"), bytearray(), array("d")
+        odd_user, odd_day, odd_status, odd_shift, odd_ot = array("i"), array("i"), array("b"), array("b"), array("d")
+        lo, hi = start.isoformat(), end.isoformat()
+        for uname, records in st.attendance_slices(lo, hi):
+            idx = len(usernames)
+            usernames.append(uname)
+            p_days, p_codes, p_ots, odd = records.arrays()
+            days.extend(p_days)
+            codes += p_codes
+            ots.extend(p_ots)
+            counts.append(len(p_days))
+            for d, r in odd.items():
+                try:
+                    ordinal = date.fromisoformat(d).toordinal()
+                    hours = float(r.get("ot_hours", 0) or 0)
+                except (TypeError, ValueError):
+                    continue
+                odd_user.append(idx)
+                odd_day.append(ordinal)
+                odd_status.append(STATUS_CODES.get(r.get("status"), 0))
+                odd_shift.append(SHIFT_CODES.get((r.get("shift") or "").strip() or "GEN", 0))
+                odd_ot.append(hours)
+        packed = np.frombuffer(codes, dtype=np.uint8)
+        status_of = np.array([STATUS_CODES.get(status, 0) for _, status in RECORD_FIELDS], dtype=np.int8)
+        shift_of = np.array([SHIFT_CODES[shift or "GEN"] for shift, _ in RECORD_FIELDS], dtype=np.int8)
+        return cls(usernames, start, end,
+                   np.concatenate([np.repeat(np.arange(len(usernames), dtype=np.int32), counts),
+                                   np.frombuffer(odd_user, dtype=np.int32)]),
+                   np.concatenate([np.frombuffer(days, dtype=np.int32), np.frombuffer(odd_day, dtype=np.int32)]),
+                   np.concatenate([status_of[packed], np.frombuffer(odd_status, dtype=np.int8)]),
+                   np.concatenate([shift_of[packed], np.frombuffer(odd_shift, dtype=np.int8)]),
+                   np.concatenate([np.frombuffer(ots), np.frombuffer(odd_ot)]).astype(np.float32))
+
+    def _present_ot(self):
+        # OT only counts on Present days, as in add_to_totals()
+        return np.where(self.status == PRESENT, self.ot, np.float32(0))
+
+    def daily_headcount(self):
+        n = self.end.toordinal() - self.start.toordinal() + 1
+        offset = self.day - self.start.toordinal()
+        present = np.bincount(offset[self.status == PRESENT], minlength=n)
+        absent = np.bincount(offset[self.status == ABSENT], minlength=n)
+        return [{"date": date.fromordinal(self.start.toordinal() + i).isoformat(),
+                 "present": int(present[i]), "absent": int(absent[i])} for i in range(n)]
+
+    def shift_totals(self):
+        present = self.status == PRESENT
+        codes = self.shift[present]
+        days = np.bincount(codes, minlength=len(SHIFTS) + 1)
+        hours = np.bincount(codes, weights=self.ot[present], minlength=len(SHIFTS) + 1)
+        return {name: {"days": int(days[code]), "ot_hours": round(float(hours[code]), 1)}
+                for name, code in SHIFT_CODES.items()}
+
+    def user_ot(self):
+        return np.bincount(self.user, weights=self._present_ot(), minlength=len(self.usernames))
+
+    def ot_distribution(self, bins=10):
+        per_user = self.user_ot()
+        if not len(per_user):
+            return {"users": 0}
+        counts, edges = np.histogram(per_user, bins=bins)
+        p50, p90, p99 = np.percentile(per_user, [50, 90, 99])
+        return {"users": len(per_user), "mean": round(float(per_user.mean()), 2),
+                "p50": round(float(p50), 1), "p90": round(float(p90), 1), "p99": round(float(p99), 1),
+                "max": round(float(per_user.max()), 1),
+                "histogram": {"counts": counts.tolist(), "edges": [round(float(e), 2) for e in edges]}}
+
+    def top_ot(self, n=10):
+        per_user = self.user_ot()
+        n = min(n, int(np.count_nonzero(per_user)))
+        if n <= 0:
+            return []
+        top = np.argpartition(-per_user, n - 1)[:n]
+        top = top[np.lexsort((top, -per_user[top]))]  # by OT desc, then username
+        return [{"username": self.usernames[i], "ot_hours": round(float(per_user[i]), 1)} for i in top]
+
+_numpy_tried = False
+
+def load_numpy():
+    """numpy, imported on first call (None if it isn't installed). It takes
+    tens of ms to import and only the stats endpoint uses it."""
+    global np, _numpy_tried
+    if not _numpy_tried:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            pass
+        _numpy_tried = True
+    return np
+
+_columns_lock = threading.Lock()
+_columns_cache = OrderedDict()  # (start, end) -> (store version, AttendanceColumns)
+COLUMNS_CACHE_SIZE = 4
+
+def attendance_columns(start, end):
+    """AttendanceColumns for [start, end], rebuilt when the store changes."""
+    load_numpy()
+    version = store.version()
+    with _columns_lock:
+        hit = _columns_cache.get((start, end))
+        if hit and hit[0] == version:
+            _columns_cache.move_to_end((start, end))
+            return hit[1]
+    cols = AttendanceColumns.build(store, start, end)
+    with _columns_lock:
+        _columns_cache[(start, end)] = (version, cols)
+        _columns_cache.move_to_end((start, end))
+        while len(_columns_cache) > COLUMNS_CACHE_SIZE:
+            _columns_cache.popitem(last=False)
+    return cols
+
+@app.route("/api/admin/stats")
+@require_admin
+def api_admin_stats(_auth_user=None, _auth_payload=None, _auth_obj=None):
+    # ?year=&month= cycle (default: current), ?top= users by OT, ?bins= for
+    # the per-user OT histogram
+    if load_numpy() is None:
+        return jsonify({"error":"Statistics need numpy (pip install numpy)"}), 501
+    cyc = requested_cycle()
+    if not cyc:
+        return jsonify({"error":"Invalid year/month"}), 400
+    year, month = cyc
+    top = min(max(request.args.get("top", 10, type=int), 1), 1000)
+    bins = min(max(request.args.get("bins", 10, type=int), 1), 100)
+    def build():
+        cols = attendance_columns(*cycle_bounds(year, month))
+        return {"year": year, "month": month, "records": len(cols.day),
+                "daily_headcount": cols.daily_headcount(), "shifts": cols.shift_totals(),
+                "ot_distribution": cols.ot_distribution(bins), "top_ot": cols.top_ot(top)}
+    return etag_response(("stats", store.version(), year, month, top, bins), build)
+
+# ---------------------------
+# ASGI serving mode: same routes, blocking work on an executor
+# ---------------------------
+class AsyncSubscription(Subscription):
+    """Subscription read by a coroutine on `loop`; offer() may be called
+    from any thread."""
+
+    def __init__(self, size, loop):
+        import asyncio
+        super().__init__(size)
+        self._loop = loop
+        self._ready = asyncio.Event()
+
+    def offer(self, chunk):
+        ok = super().offer(chunk)
+        try:
+            self._loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:  # loop already closed
+            pass
+        return ok
+
+    async def get(self, timeout):
+        import asyncio
+        while True:
+            chunk = super().get(0)
+            if chunk != "":
+                return chunk
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return ""
+
+class AsgiApp:
+    """ASGI entry point for the Flask app.
+
+    The event loop owns the connections: it reads request bodies, writes
+    responses and holds keep-alive, slow and streaming clients without a
+    thread each. Only running a route (auth, storage I/O, rendering, and
+    waiting on the KDF pool) takes one of `threads` executor threads, so
+    the routes and payloads are exactly the WSGI ones. The admin event
+    stream is served natively: a listener costs a queue, not a thread.
+    """
+
+    def __init__(self, wsgi_app, threads):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="asgi")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    self.executor.shutdown(wait=False)
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        environ = self.environ(scope, bytes(body))
+        if scope["path"] == "/api/admin/events" and scope["method"] == "GET":
+            if await self.run(self.is_admin, environ):
+                return await self.stream_events(receive, send)
+        await self.call_wsgi(environ, send)
+
+    async def run(self, fn, *args):
+        import asyncio
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    @staticmethod
+    def environ(scope, body):
+        """PEP 3333 environ for an ASGI http scope and its full body."""
+        server = scope.get("server") or ("localhost", 80)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin-1"),
+            "PATH_INFO": scope["path"].encode().decode("latin-1"),
+            "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+            "SERVER_NAME": server[0], "SERVER_PORT": str(server[1] or 80),
+            "SERVER_PROTOCOL": "HTTP/" + scope.get("http_version", "1.1"),
+            "wsgi.version": (1, 0), "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": io.BytesIO(body), "wsgi.input_terminated": True, "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True, "wsgi.multiprocess": True, "wsgi.run_once": False,
+        }
+        if scope.get("client"):
+            environ["REMOTE_ADDR"], environ["REMOTE_PORT"] = scope["client"][0], str(scope["client"][1])
+        for name, value in scope["headers"]:
+            name, value = name.decode("latin-1"), value.decode("latin-1")
+            if name == "content-type":
+                key = "CONTENT_TYPE"
+            elif name == "content-length":
+                key = "CONTENT_LENGTH"
+            else:
+                key = "HTTP_" + name.upper().replace("-", "_")
+            if key in environ:
+                value = environ[key] + ("; " if key == "HTTP_COOKIE" else ",") + value
+            environ[key] = value
+        return environ
+
+    def start_wsgi(self, environ):
+        # runs on the executor: the whole route, up to its first body chunks
+        started = {}
+        def start_response(status, headers, exc_info=None):
+            started["status"], started["headers"] = status, headers
+        body = self.wsgi_app(environ, start_response)
+        it = iter(body)
+        chunks, done = self.pull(body, it)
+        return started, body, it, chunks, done
+
+    @staticmethod
+    def pull(body, it, limit=EXPORT_CHUNK):
+        """Body chunks up to about `limit` bytes, and whether that was all
+        (the body is closed then, still on the executor)."""
+        chunks, size = [], 0
+        for chunk in it:
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= limit:
+                return chunks, False
+        if hasattr(body, "close"):
+            body.close()
+        return chunks, True
+
+    async def call_wsgi(self, environ, send):
+        # every step of one response runs in the same context: pulls land on
+        # any executor thread, and a body that pushed context variables
+        # (stream_with_context) must find them again on the next one
+        ctx = contextvars.copy_context()
+        started, body, it, chunks, done = await self.run(ctx.run, self.start_wsgi, environ)
+        try:
+            status = int(started["status"].split(" ", 1)[0])
+            headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in started["headers"]]
+            await send({"type": "http.response.start", "status": status, "headers": headers})
+            while not done:
+                # streamed bodies (export, ndjson) are produced on the executor too
+                for chunk in chunks:
+                    if chunk:
+                        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                chunks, done = await self.run(ctx.run, self.pull, body, it)
+            await send({"type": "http.response.body", "body": b"".join(chunks)})
+        finally:
+            if not done and hasattr(body, "close"):  # client went away mid-stream
+                await self.run(ctx.run, body.close)
+
+    def is_admin(self, environ):
+        with self.wsgi_app.request_context(environ):
+            auth, err = authenticate()
+            return not err and bool(auth[2].get("is_admin"))
+
+    async def stream_events(self, receive, send):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        sub = events.subscribe(lambda size: AsyncSubscription(size, loop))
+        if sub is None:
+            body = json.dumps({"error":"Too many live listeners"}).encode()
+            await send({"type": "http.response.start", "status": 503,
+                        "headers": [(b"content-type", b"application/json"), (b"retry-after", b"30")]})
+            await send({"type": "http.response.body", "body": body})
+            return
+        async def wait_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+        gone = asyncio.ensure_future(wait_disconnect())
+        try:
+            await send({"type": "http.response.start", "status": 200, "headers": [
+                (b"content-type", b"text/event-stream; charset=utf-8"), (b"cache-control", b"no-store"),
+                (b"x-accel-buffering", b"no")]})
+            await send({"type": "http.response.body", "body": b"retry: 3000\n\n", "more_body": True})
+            while not gone.done():
+                chunk = await sub.get(EVENTS_HEARTBEAT)
+                if chunk is None:
+                    await send({"type": "http.response.body", "body": b"event: dropped\ndata: {}\n\n"})
+                    return
+                await send({"type": "http.response.body", "body": (chunk or ": keepalive\n\n").encode(),
+                            "more_body": True})
+        finally:
+            gone.cancel()
+            events.unsubscribe(sub)
+
+asgi_app = AsgiApp(app, ASGI_THREADS)
+
+# ---------------------------
+# CLI commands: flask --app api/app.py <command>
+# ---------------------------
+@app.cli.command("migrate-sqlite")
+@click.option("--src", default=str(DATA_FILE), show_default=True, help="JSON data file (its .log is replayed too).")
+@click.option("--dest", default=str(SQLITE_FILE), show_default=True, help="SQLite database to fill.")
+def migrate_sqlite(src, dest):
+    """One-shot import of the JSON data file into SQLite."""
+    source = LogStore(src)
+    users = source.users()
+    target = SQLiteStore(dest)
+    # one transaction for the whole import
+    target._commit([{"op": "put_user", "user": u, "value": obj} for u, obj in users])
+    days = sum(len(obj.get("attendance", {})) for _, obj in users)
+    click.echo(f"Migrated {len(users)} users / {days} attendance records into {dest}")
+
+@app.cli.command("migrate-shards")
+@click.option("--src", default=str(DATA_FILE), show_default=True, help="JSON data file (its .log is replayed too).")
+@click.option("--dest", default=str(SHARD_DIR), show_default=True, help="Shard directory to fill.")
+@click.option("--buckets", default=SHARD_BUCKETS, show_default=True, help="Bucket files (new directories only).")
+def migrate_shards(src, dest, buckets):
+    """One-shot import of the JSON data file into a sharded directory."""
+    users = LogStore(src).users()
+    target = ShardedStore(dest, buckets)
+    target._commit([{"op": "put_user", "user": u, "value": obj} for u, obj in users])
+    click.echo(f"Migrated {len(users)} users into {target.buckets} buckets in {dest}")
+
+@app.cli.command("rebuild-manifest")
+@click.option("--dir", "directory", default=str(SHARD_DIR), show_default=True, help="Shard directory.")
+def rebuild_manifest(directory):
+    """Re-list every user of a sharded store in its manifest."""
+    click.echo(f"Manifest lists {ShardedStore(directory).rebuild_manifest()} users")
+
+@app.cli.command("archive")
+@click.option("--after-months", type=click.IntRange(1), default=ARCHIVE_AFTER_MONTHS, show_default=True,
+              help="Archive cycles at least this many cycles older than the current one.")
+def archive_command(after_months):
+    """Move old closed cycles into ATTENDANCE_ARCHIVE_DIR (run it e.g. monthly)."""
+    if not ARCHIVE_DIR:
+        raise click.UsageError("Set ATTENDANCE_ARCHIVE_DIR to archive")
+    through = add_cycles(cycle_of(date.today().isoformat()), -after_months)
+    started = time.perf_counter()
+    users, records = store.archive(through)
+    click.echo(f"Archived {records} records of {users} users (cycles up to {through[0]}-{through[1]:02d}) "
+               f"in {time.perf_counter() - started:.1f}s")
+
+@app.cli.command("compile-templates")
+def compile_templates():
+    """Compile every page template (fills TEMPLATE_BYTECODE_DIR if set)."""
+    for name in TEMPLATES:
+        app.jinja_env.get_template(name)
+    click.echo(f"Compiled {len(TEMPLATES)} templates")
+
+@app.cli.command("report")
+@click.option("--year", type=int, default=lambda: date.today().year, help="Cycle year (default: current).")
+@click.option("--month", type=click.IntRange(1, 12), default=lambda: date.today().month, help="Cycle month (default: current).")
+@click.option("--workers", type=int, default=REPORT_WORKERS, show_default=True, help="Worker processes.")
+@click.option("--users/--no-users", default=False, help="Include per-user totals.")
+@click.option("--output", type=click.File("w"), default="-", help="Write the JSON here instead of stdout.")
+def report_command(year, month, workers, users, output):
+    """Org-wide totals for one cycle: daily headcount, OT per shift, absentee rates."""
+    started = time.perf_counter()
+    report = org_report(year, month, workers=workers, with_users=users)
+    json.dump(report, output, indent=2)
+    output.write("\n")
+    click.echo(f"{report['users']} users in {time.perf_counter() - started:.2f}s with {workers} worker(s)", err=True)
+
 # ---------------------------
 # Run
 # ---------------------------
 if __name__ == "__main__":
     # convenience: create an initial admin if none exists
-    d = read_data()
-    if "admin" not in d:
-        d["admin"] = {
+    if not store.has_user("admin"):
+        store.put_user("admin", {
             "name": "Administrator",
-            "password": generate_password_hash("admin123"),
+            "password": hash_password("admin123"),
             "is_admin": True,
             "attendance": {}
-        }
-        write_data(d)
+        })
         print("Created default admin / admin123 (change password immediately)")
     app.run(debug=True)
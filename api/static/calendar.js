@@ -0,0 +1,137 @@
+// Calendar page: fetches one cycle from /api/calendar and renders it here,
+// so month navigation only transfers the cycle's records.
+document.addEventListener('DOMContentLoaded', function(){
+  const bsModal=new bootstrap.Modal(document.getElementById('attModal'));
+  let currentDate=null,selectedShift='GEN',selectedStatus='Present',view=null;
+  const shiftLine=document.getElementById('shiftLine');
+  const calBody=document.getElementById('calBody');
+
+  const esc=s=>String(s).replace(/[&<>"']/g,c=>({'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;',"'":'&#39;'}[c]));
+  function parseISO(s){const p=s.split('-');return new Date(Date.UTC(+p[0],+p[1]-1,+p[2]));}
+  function toISO(d){return d.toISOString().slice(0,10);}
+  function otText(v){return v?('OT: '+v):'';}
+
+  function cellHTML(d,rec){
+    const iso=toISO(d),st=rec.status||'';
+    let cls='day-cell';
+    if(st==='Present')cls+=' present';else if(st==='Absent')cls+=' absent';
+    if(d.getUTCDay()===0)cls+=' sunday';
+    if(iso===view.today)cls+=' today-border';
+    const shift=(rec.shift&&rec.shift!=='GEN')?rec.shift:'GEN';
+    return '<td class="p-0"><div class="'+cls+'" data-date="'+iso+'">'+
+      '<div class="d-flex justify-content-between"><div class="day-num">'+d.getUTCDate()+'</div><div class="status-pill">'+esc(st.slice(0,1))+'</div></div>'+
+      '<div style="position:absolute;bottom:8px;left:8px;right:8px;">'+
+      '<div class="ot-badge">'+esc(otText(rec.ot_hours))+'</div>'+
+      '<div class="shift-label">'+esc(shift)+'</div></div></div></td>';
+  }
+
+  function renderSummary(s){
+    document.getElementById('presentCount').textContent=s.present;
+    document.getElementById('absentCount').textContent=s.absent;
+    document.getElementById('otHoursTotal').textContent=s.ot_hours.toFixed(1);
+    shiftLine.innerHTML='⚙️ <b>Shifts →</b><br>'+s.shift_line;
+  }
+
+  function navHref(year,month){return '/?month='+month+'&year='+year;}
+
+  function render(cal){
+    view=cal;
+    document.getElementById('monthLabel').textContent=cal.label;
+    const prev=cal.month>1?[cal.year,cal.month-1]:[cal.year-1,12];
+    const next=cal.month<12?[cal.year,cal.month+1]:[cal.year+1,1];
+    const p=document.getElementById('prevMonth'),n=document.getElementById('nextMonth');
+    p.href=navHref(prev[0],prev[1]);p.dataset.year=prev[0];p.dataset.month=prev[1];
+    n.href=navHref(next[0],next[1]);n.dataset.year=next[0];n.dataset.month=next[1];
+    const start=parseISO(cal.start),end=parseISO(cal.end);
+    const cells=[];
+    for(let i=0;i<start.getUTCDay();i++)cells.push('<td class="p-0"></td>');
+    for(let d=new Date(start);d<=end;d.setUTCDate(d.getUTCDate()+1))cells.push(cellHTML(d,cal.records[toISO(d)]||{}));
+    while(cells.length%7)cells.push('<td class="p-0"></td>');
+    let html='';
+    for(let i=0;i<cells.length;i+=7)html+='<tr>'+cells.slice(i,i+7).join('')+'</tr>';
+    calBody.innerHTML=html;
+    renderSummary(cal.summary);
+  }
+
+  async function load(year,month,push){
+    const qs=(year&&month)?('?year='+year+'&month='+month):'';
+    const r=await fetch('/api/calendar'+qs);
+    if(r.status===401){window.location='/login';return;}
+    if(!r.ok)return;
+    const cal=await r.json();
+    render(cal);
+    if(push)history.pushState({year:cal.year,month:cal.month},'',navHref(cal.year,cal.month));
+  }
+
+  function setShiftActive(s){selectedShift=s;document.querySelectorAll('.btn-shift').forEach(b=>{const act=b.dataset.shift===s;b.classList.toggle('btn-primary',act);b.classList.toggle('btn-outline-secondary',!act);});}
+  function setStatusActive(s){selectedStatus=s;const p=document.getElementById('markPresent'),a=document.getElementById('markAbsent');
+    if(s==='Present'){p.classList.add('btn-success');p.classList.remove('btn-outline-success');a.classList.add('btn-outline-danger');a.classList.remove('btn-danger');}
+    else{a.classList.add('btn-danger');a.classList.remove('btn-outline-danger');p.classList.add('btn-outline-success');p.classList.remove('btn-success');document.getElementById('otHours').value=0;}
+  }
+
+  calBody.addEventListener('click',function(e){
+    const cell=e.target.closest('.day-cell');
+    if(!cell)return;
+    currentDate=cell.dataset.date;document.getElementById('modalDate').textContent=currentDate;
+    const d=view.records[currentDate]||{};
+    setShiftActive(d.shift||'GEN');setStatusActive(d.status||'Present');document.getElementById('otHours').value=d.ot_hours||0;
+    bsModal.show();
+  });
+
+  document.querySelectorAll('.nav-btn').forEach(a=>a.addEventListener('click',e=>{
+    e.preventDefault();load(a.dataset.year,a.dataset.month,true);
+  }));
+  window.addEventListener('popstate',e=>{const s=e.state||{};load(s.year,s.month,false);});
+
+  document.querySelectorAll('.btn-shift').forEach(b=>b.addEventListener('click',()=>setShiftActive(b.dataset.shift)));
+  document.getElementById('markPresent').onclick=()=>setStatusActive('Present');
+  document.getElementById('markAbsent').onclick=()=>setStatusActive('Absent');
+
+  async function updateSummary(){
+    const r=await fetch('/summary?year='+view.year+'&month='+view.month);
+    if(r.ok)renderSummary(await r.json());
+  }
+
+  function redrawCell(iso){
+    const cell=document.querySelector('.day-cell[data-date="'+iso+'"]');
+    if(cell)cell.parentElement.outerHTML=cellHTML(parseISO(iso),view.records[iso]||{});
+  }
+
+  document.getElementById('saveBtn').onclick=async()=>{
+    if(!currentDate)return;
+    const otVal=selectedStatus==='Absent'?0:parseFloat(document.getElementById('otHours').value||0);
+    const payload={date:currentDate,shift:selectedShift,status:selectedStatus,ot_hours:otVal};
+    try{
+      const res=await fetch('/attendance',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify(payload)});
+      if(res.ok){
+        bsModal.hide();
+        view.records[currentDate]={shift:selectedShift,status:selectedStatus,ot_hours:otVal};
+        redrawCell(currentDate);
+        updateSummary();
+      } else {
+        const j = await res.json().catch(()=>({error:'Save failed'}));
+        alert(j.error || 'Save failed');
+      }
+    }catch(e){alert('Save failed:'+e.message);}
+  };
+
+  document.getElementById('clearBtn').onclick=async()=>{
+    if(!currentDate||!confirm('Clear attendance for '+currentDate+'?'))return;
+    try{
+      const r=await fetch('/attendance/'+currentDate,{method:'DELETE'});
+      if(r.ok){
+        bsModal.hide();
+        delete view.records[currentDate];
+        redrawCell(currentDate);
+        updateSummary();
+      } else {
+        const j = await r.json().catch(()=>({error:'Clear failed'}));
+        alert(j.error || 'Clear failed');
+      }
+    }catch(e){alert('Clear failed:'+e.message);}
+  };
+  setShiftActive('GEN');setStatusActive('Present');
+
+  const q=new URLSearchParams(window.location.search);
+  load(q.get('year'),q.get('month'),false);
+});
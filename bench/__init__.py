@@ -0,0 +1,9 @@
+"""Benchmarks for the attendance app.
+
+    python -m bench --users 500 --years 2 --threads 1,8 --out results.json
+    python -m bench --compare results.json --out after.json
+
+The app is imported with its storage pointed at a scratch directory, filled
+with synthetic users (bench.datagen) and driven through the Flask test
+client. See `python -m bench --help` for the knobs.
+"""
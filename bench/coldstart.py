@@ -0,0 +1,105 @@
+"""Cold-start benchmark: fresh interpreters, import to first response.
+
+    python -m bench.coldstart --runs 20 --out coldstart.json [--compare old.json]
+
+Each run starts a new Python process that imports api/app.py (storage in a
+scratch directory holding one user), then serves GET /login and an
+authenticated GET / through the test client, timing each step. Children don't
+write bytecode, so every run sees the same .pyc state (delete
+api/__pycache__ to include compiling app.py, as a fresh serverless instance
+without one would).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from bench.run import API_DIR, git_commit, percentile
+
+CHILD = r"""
+import sys, time, json
+t0 = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import app
+t_import = time.perf_counter()
+client = app.app.test_client()
+assert client.get("/login").status_code == 200
+t_login = time.perf_counter()
+token = app.create_jwt({"sub": "cold"})
+t_token = time.perf_counter()
+resp = client.get("/", headers={"Authorization": "Bearer " + token})
+assert resp.status_code == 200, resp.status_code
+t_index = time.perf_counter()
+print(json.dumps({"import_ms": (t_import - t0) * 1000, "first_login_ms": (t_login - t_import) * 1000,
+                  "first_index_ms": (t_index - t_token) * 1000, "to_index_ms": (t_index - t0) * 1000}))
+"""
+STEPS = ["process_ms", "import_ms", "first_login_ms", "first_index_ms", "to_index_ms"]
+
+
+def one_run(workdir, backend):
+    env = dict(os.environ, ATTENDANCE_BACKEND=backend, PYTHONDONTWRITEBYTECODE="1",
+               ATTENDANCE_DATA_FILE=str(workdir / "attendance.json"),
+               ATTENDANCE_SQLITE_FILE=str(workdir / "attendance.db"),
+               ATTENDANCE_SHARD_DIR=str(workdir / "shards"))
+    started = time.perf_counter()
+    out = subprocess.run([sys.executable, "-B", "-c", CHILD, str(API_DIR)], env=env,
+                         capture_output=True, text=True, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result["process_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.coldstart", description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--backend", choices=["json", "log", "sqlite", "sharded"], default="json")
+    parser.add_argument("--out", type=Path, default=Path("coldstart-results.json"))
+    parser.add_argument("--compare", type=Path, help="earlier results file to show changes against")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="attendance-cold-") as tmp:
+        workdir = Path(tmp)
+        user = {"cold": {"name": "Cold Start", "password": "", "is_admin": False, "attendance": {}}}
+        (workdir / "attendance.json").write_text(json.dumps(user))
+        if args.backend in ("sqlite", "sharded"):
+            env = dict(os.environ, ATTENDANCE_BACKEND=args.backend,
+                       ATTENDANCE_SQLITE_FILE=str(workdir / "attendance.db"),
+                       ATTENDANCE_SHARD_DIR=str(workdir / "shards"))
+            subprocess.run([sys.executable, "-c",
+                            "import sys; sys.path.insert(0, sys.argv[1]); import app; "
+                            "app.store.put_user('cold', {'name': 'Cold Start', 'password': '', 'attendance': {}})",
+                            str(API_DIR)], env=env, check=True)
+        runs = [one_run(workdir, args.backend) for _ in range(args.runs)]
+
+    summary = {}
+    for step in STEPS:
+        values = sorted(r[step] for r in runs)
+        summary[step] = {"median": round(statistics.median(values), 2),
+                         "p95": round(percentile(values, 95), 2), "min": round(values[0], 2)}
+    report = {"meta": {"commit": git_commit(), "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                       "python": platform.python_version(), "platform": platform.platform(),
+                       "backend": args.backend, "runs": args.runs},
+              "summary": summary, "runs": runs}
+    args.out.write_text(json.dumps(report, indent=2) + "\n")
+
+    base = json.loads(args.compare.read_text())["summary"] if args.compare else {}
+    print(f"{'step':>16} {'median':>18} {'p95':>10} {'min':>10}")
+    for step in STEPS:
+        s = summary[step]
+        median = f"{s['median']:.1f}"
+        old = base.get(step, {}).get("median")
+        if old:
+            median += f" ({(s['median'] - old) / old * 100:+.0f}%)"
+        print(f"{step:>16} {median:>18} {s['p95']:>10.1f} {s['min']:>10.1f}")
+    print(f"results written to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Synthetic attendance data: N users x M years of daily records.
+
+Output is deterministic for a given seed and end date, so two runs against
+different commits measure the same dataset.
+"""
+import random
+from datetime import date, timedelta
+
+PASSWORD = "bench-pass"
+ADMIN_USER = "bench-admin"
+# relative frequency of each shift on a present day
+SHIFT_WEIGHTS = {"GEN": 10, "FS": 4, "SS": 3, "NS": 2, "GEN2": 1}
+OT_CHOICES = [0.0] * 6 + [1.0, 1.5, 2.0, 2.5, 4.0]
+ABSENT_RATE = 0.06
+UNMARKED_RATE = 0.03  # working days nobody filled in
+
+
+def username(i):
+    return f"user{i:06d}"
+
+
+def user_records(rng, start, end):
+    """{day_iso: record} for every working day in [start, end]; Sundays are off."""
+    shifts, weights = list(SHIFT_WEIGHTS), list(SHIFT_WEIGHTS.values())
+    records = {}
+    d = start
+    while d <= end:
+        if d.weekday() != 6 and rng.random() >= UNMARKED_RATE:
+            if rng.random() < ABSENT_RATE:
+                records[d.isoformat()] = {"shift": "GEN", "status": "Absent", "ot_hours": 0.0}
+            else:
+                records[d.isoformat()] = {"shift": rng.choices(shifts, weights)[0], "status": "Present",
+                                          "ot_hours": rng.choice(OT_CHOICES)}
+        d += timedelta(days=1)
+    return records
+
+
+def generate(users, years, seed=1, end=None, password_hash=""):
+    """Yield (username, user_obj) for `users` users with `years` years of
+    history ending at `end` (default: today)."""
+    rng = random.Random(seed)
+    end = end or date.today()
+    start = end - timedelta(days=round(365.25 * years) - 1)
+    for i in range(users):
+        yield username(i), {"name": f"Bench User {i}", "password": password_hash, "is_admin": False,
+                            "attendance": user_records(rng, start, end)}
+
+
+def populate(store, users, years, seed=1, end=None, password_hash="", batch=500):
+    """Write the generated users (plus an admin) into `store`; returns the
+    number of attendance records written."""
+    records = 0
+    ops = [{"op": "put_user", "user": ADMIN_USER,
+            "value": {"name": "Bench Admin", "password": password_hash, "is_admin": True, "attendance": {}}}]
+    for name, obj in generate(users, years, seed, end, password_hash):
+        records += len(obj["attendance"])
+        ops.append({"op": "put_user", "user": name, "value": obj})
+        if len(ops) >= batch:
+            store._commit(ops)
+            ops = []
+    if ops:
+        store._commit(ops)
+    return records
@@ -0,0 +1,215 @@
+"""Drive the app's routes through the Flask test client and record latency.
+
+Every scenario runs once per thread count; each thread has its own client
+and session (a different user, or the admin for admin routes) and issues
+its share of the requests back to back. Latency is measured per request
+around the test-client call, so it covers routing, auth, storage and
+rendering but not a real network or WSGI server.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+from bench import datagen
+
+ROOT = Path(__file__).resolve().parent.parent
+API_DIR = ROOT / "api"
+
+
+def load_app(workdir, backend):
+    """Import api/app.py with its storage inside `workdir`."""
+    os.environ["ATTENDANCE_BACKEND"] = backend
+    os.environ["ATTENDANCE_DATA_FILE"] = str(workdir / "attendance.json")
+    os.environ["ATTENDANCE_SQLITE_FILE"] = str(workdir / "attendance.db")
+    os.environ["ATTENDANCE_SHARD_DIR"] = str(workdir / "shards")
+    sys.path.insert(0, str(API_DIR))
+    import app
+    # the benchmark logs in far faster than any person could
+    app.login_user_limiter = app.RateLimiter(10**9, 1)
+    app.login_ip_limiter = app.RateLimiter(10**9, 1)
+    return app
+
+
+def data_cycles(end, years):
+    """(year, month) of every attendance cycle the dataset covers."""
+    out = []
+    y, m = end.year, end.month
+    for _ in range(max(1, round(12 * years))):
+        out.append((y, m))
+        y, m = (y - 1, 12) if m == 1 else (y, m - 1)
+    return out
+
+
+def random_day(rng, ctx):
+    y, m = rng.choice(ctx["cycles"])
+    return date(y, m, rng.randint(1, 25)).isoformat()
+
+
+SCENARIOS = {
+    "index": lambda c, rng, ctx: c.get("/"),
+    "summary": lambda c, rng, ctx: c.get("/summary?year=%d&month=%d" % rng.choice(ctx["cycles"])),
+    "attendance_post": lambda c, rng, ctx: c.post("/attendance", json={
+        "date": random_day(rng, ctx), "shift": rng.choice(list(datagen.SHIFT_WEIGHTS)),
+        "status": "Present", "ot_hours": rng.choice(datagen.OT_CHOICES)}),
+    "login": lambda c, rng, ctx: c.post("/api/login", json={"user": ctx["user"], "pass": datagen.PASSWORD}),
+    # a prefix matching ~100 users, then one page of them
+    "admin_users": lambda c, rng, ctx: c.get(
+        "/api/admin/users?limit=100&q=" + datagen.username(rng.randrange(ctx["users"]))[:-2]),
+}
+ADMIN_SCENARIOS = {"admin_users"}
+
+
+def login(app, user):
+    client = app.app.test_client()
+    resp = client.post("/api/login", json={"user": user, "pass": datagen.PASSWORD})
+    if resp.status_code != 200:
+        raise SystemExit(f"login as {user} failed: {resp.status_code} {resp.get_data(as_text=True)}")
+    return client
+
+
+def percentile(sorted_values, p):
+    # nearest-rank
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, -(-len(sorted_values) * p // 100) - 1))
+    return sorted_values[int(k)]
+
+
+def run_scenario(name, sessions, threads, requests, seed):
+    fn = SCENARIOS[name]
+    per_thread = max(1, requests // threads)
+    latencies = [[] for _ in range(threads)]
+    errors = [0] * threads
+    marks = []
+    barrier = threading.Barrier(threads, action=lambda: marks.append(time.perf_counter()))
+
+    def worker(k):
+        client, ctx = sessions[k]
+        rng = random.Random(seed * 1000 + k)
+        barrier.wait()
+        for _ in range(per_thread):
+            t0 = time.perf_counter()
+            resp = fn(client, rng, ctx)
+            latencies[k].append(time.perf_counter() - t0)
+            if resp.status_code >= 400:
+                errors[k] += 1
+            resp.close()
+
+    pool = [threading.Thread(target=worker, args=(k,)) for k in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    wall = time.perf_counter() - marks[0]
+    values = sorted(v for per in latencies for v in per)
+    ms = lambda v: round(v * 1000, 3)
+    return {"scenario": name, "threads": threads, "requests": len(values), "errors": sum(errors),
+            "mean_ms": ms(sum(values) / len(values)), "p50_ms": ms(percentile(values, 50)),
+            "p95_ms": ms(percentile(values, 95)), "p99_ms": ms(percentile(values, 99)),
+            "max_ms": ms(values[-1]), "throughput_rps": round(len(values) / wall, 1)}
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "describe", "--always", "--dirty"], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results, baseline=None):
+    base = {(r["scenario"], r["threads"]): r for r in (baseline or {}).get("results", [])}
+    cols = ["scenario", "threads", "requests", "errors", "p50_ms", "p95_ms", "p99_ms", "throughput_rps"]
+    print("  ".join(f"{c:>15}" for c in cols))
+    for r in results:
+        cells = []
+        for c in cols:
+            cell = str(r[c])
+            old = base.get((r["scenario"], r["threads"]), {}).get(c)
+            if c.endswith(("_ms", "_rps")) and old:
+                cell += f" ({(r[c] - old) / old * 100:+.0f}%)"
+            cells.append(f"{cell:>15}")
+        print("  ".join(cells))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200, help="synthetic users (default: %(default)s)")
+    parser.add_argument("--years", type=float, default=1, help="years of history per user (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--end", type=date.fromisoformat, default=None,
+                        help="last day of generated data, YYYY-MM-DD (default: today)")
+    parser.add_argument("--backend", choices=["json", "log", "sqlite", "sharded"], default="json")
+    parser.add_argument("--threads", default="1,8", help="comma-separated thread counts (default: %(default)s)")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and thread count")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests per scenario first")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset to run")
+    parser.add_argument("--data-dir", type=Path, help="keep the dataset here (reused if already filled)")
+    parser.add_argument("--out", type=Path, default=Path("bench-results.json"), help="JSON results file")
+    parser.add_argument("--compare", type=Path, help="earlier results file to show changes against")
+    args = parser.parse_args(argv)
+
+    thread_counts = [int(t) for t in args.threads.split(",")]
+    names = [n for n in args.scenarios.split(",") if n]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+
+    tmp = None
+    if args.data_dir:
+        workdir = args.data_dir
+        workdir.mkdir(parents=True, exist_ok=True)
+    else:
+        tmp = tempfile.TemporaryDirectory(prefix="attendance-bench-")
+        workdir = Path(tmp.name)
+    app = load_app(workdir, args.backend)
+    end = args.end or date.today()
+
+    started = time.perf_counter()
+    if app.store.has_user(datagen.ADMIN_USER):
+        records = None
+        print(f"reusing dataset in {workdir}", file=sys.stderr)
+    else:
+        records = datagen.populate(app.store, args.users, args.years, args.seed, end,
+                                   password_hash=app.hash_password(datagen.PASSWORD))
+        print(f"generated {args.users} users / {records} records in {time.perf_counter() - started:.1f}s",
+              file=sys.stderr)
+
+    ctx = {"cycles": data_cycles(end, args.years), "users": args.users}
+    n = max(thread_counts)
+    user_sessions = [(login(app, datagen.username(k % args.users)), dict(ctx, user=datagen.username(k % args.users)))
+                     for k in range(n)]
+    admin_sessions = [(login(app, datagen.ADMIN_USER), dict(ctx, user=datagen.ADMIN_USER)) for _ in range(n)]
+
+    results = []
+    for name in names:
+        sessions = admin_sessions if name in ADMIN_SCENARIOS else user_sessions
+        if args.warmup:
+            run_scenario(name, sessions, 1, args.warmup, args.seed)
+        for threads in thread_counts:
+            results.append(run_scenario(name, sessions, threads, args.requests, args.seed))
+
+    report = {
+        "meta": {"commit": git_commit(), "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                 "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+                 "backend": args.backend, "users": args.users, "years": args.years, "seed": args.seed,
+                 "end": end.isoformat(), "records": records, "requests": args.requests,
+                 "password_hash": app.PASSWORD_HASH_METHOD},
+        "results": results,
+    }
+    args.out.write_text(json.dumps(report, indent=2) + "\n")
+    print_table(results, baseline)
+    print(f"results written to {args.out}", file=sys.stderr)
+    if tmp:
+        tmp.cleanup()
@@ -0,0 +1,271 @@
+"""WSGI vs ASGI serving: the same app behind a real server, over sockets.
+
+    python -m bench.serving --users 200 --concurrency 16,256 --listeners 0,200 --out serving.json
+
+Each mode runs the app as one server process on the same dataset: "wsgi"
+is gunicorn with gthread workers (one thread per in-flight request,
+--threads of them), "asgi" is uvicorn serving app:asgi_app (routes run on
+ATTENDANCE_ASGI_THREADS=--threads executor threads, connections are held
+by the event loop). Both servers are optional dependencies of the
+benchmark only. For every listener count, that many admin event streams
+(/api/admin/events) are opened and kept open while the scenarios run at
+each concurrency level; a request that takes longer than --timeout counts
+as an error, and a level stops issuing requests after --duration seconds
+(so "completed" below "requests" means the server was starved).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+from bench import datagen
+from bench.run import API_DIR, data_cycles, git_commit, load_app, percentile
+
+SCENARIOS = {
+    "summary": lambda rng, ctx: ("GET", "/summary?year=%d&month=%d" % rng.choice(ctx["cycles"]), None),
+    "index": lambda rng, ctx: ("GET", "/", None),
+    "attendance_post": lambda rng, ctx: ("POST", "/attendance", {
+        "date": date(*rng.choice(ctx["cycles"]), rng.randint(1, 25)).isoformat(),
+        "shift": rng.choice(list(datagen.SHIFT_WEIGHTS)), "status": "Present",
+        "ot_hours": rng.choice(datagen.OT_CHOICES)}),
+}
+
+
+def server_command(mode, port, threads):
+    if mode == "wsgi":
+        return [sys.executable, "-m", "gunicorn", "--chdir", str(API_DIR), "app:app", "--bind", f"127.0.0.1:{port}",
+                "--workers", "1", "--worker-class", "gthread", "--threads", str(threads),
+                "--worker-connections", "100000", "--keep-alive", "75", "--log-level", "warning"]
+    return [sys.executable, "-m", "uvicorn", "--app-dir", str(API_DIR), "app:asgi_app", "--host", "127.0.0.1",
+            "--port", str(port), "--log-level", "warning", "--no-access-log", "--timeout-keep-alive", "75"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode, workdir, threads):
+    port = free_port()
+    env = dict(os.environ, ATTENDANCE_ASGI_THREADS=str(threads), ATTENDANCE_EVENTS_MAX_LISTENERS="100000",
+               ATTENDANCE_SLOW_REQUEST_MS="1e9",
+               ATTENDANCE_DATA_FILE=str(workdir / "attendance.json"),
+               ATTENDANCE_SQLITE_FILE=str(workdir / "attendance.db"),
+               ATTENDANCE_SHARD_DIR=str(workdir / "shards"))
+    proc = subprocess.Popen(server_command(mode, port, threads), env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"{mode} server exited with {proc.returncode} (is it installed?)")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return proc, port
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise SystemExit(f"{mode} server did not start")
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection; reconnects when the server closes it."""
+
+    def __init__(self, port):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers, body=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        head = [f"{method} {path} HTTP/1.1", "Host: 127.0.0.1", f"Content-Length: {len(payload)}"]
+        head += [f"{k}: {v}" for k, v in headers.items()]
+        if body is not None:
+            head.append("Content-Type: application/json")
+        data = ("\r\n".join(head) + "\r\n\r\n").encode() + payload
+        for attempt in (0, 1):
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+            try:
+                self.writer.write(data)
+                return await self._response()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.close()
+                if attempt:
+                    raise
+
+    async def _response(self):
+        status = int((await self.reader.readuntil(b"\r\n")).split()[1])
+        length, chunked, close = 0, False, False
+        while True:
+            line = (await self.reader.readuntil(b"\r\n")).strip()
+            if not line:
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name, value = name.strip().lower(), value.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "transfer-encoding":
+                chunked = "chunked" in value
+            elif name == "connection":
+                close = value == "close"
+        if chunked:
+            while True:
+                size = int((await self.reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+        else:
+            await self.reader.readexactly(length)
+        if close:
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def open_listeners(port, count, token, wait=3.0):
+    """Open `count` admin event streams; returns (writers, how many got their headers)."""
+    async def one():
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET /api/admin/events HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+                     f"Authorization: Bearer {token}\r\n\r\n".encode())
+        try:
+            line = await asyncio.wait_for(reader.readuntil(b"\r\n"), wait)
+            return writer, line.split()[1] == b"200"
+        except asyncio.TimeoutError:
+            return writer, False
+    results = await asyncio.gather(*(one() for _ in range(count)))
+    return [w for w, _ in results], sum(ok for _, ok in results)
+
+
+async def run_load(port, name, concurrency, requests, tokens, ctx, seed, timeout, duration):
+    fn = SCENARIOS[name]
+    per_conn = max(1, requests // concurrency)
+    latencies, errors = [], [0]
+    deadline = time.perf_counter() + duration
+
+    async def worker(k):
+        conn = Connection(port)
+        rng = random.Random(seed * 1000 + k)
+        headers = {"Authorization": "Bearer " + tokens[k % len(tokens)]}
+        try:
+            for _ in range(per_conn):
+                if time.perf_counter() > deadline:
+                    break
+                method, path, body = fn(rng, ctx)
+                t0 = time.perf_counter()
+                try:
+                    status = await asyncio.wait_for(conn.request(method, path, headers, body), timeout)
+                except (asyncio.TimeoutError, OSError, asyncio.IncompleteReadError):
+                    conn.close()
+                    errors[0] += 1
+                    continue
+                latencies.append(time.perf_counter() - t0)
+                if status >= 400:
+                    errors[0] += 1
+        finally:
+            conn.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(k) for k in range(concurrency)))
+    wall = time.perf_counter() - started
+    values = sorted(latencies)
+    ms = lambda v: round(v * 1000, 3)
+    return {"scenario": name, "concurrency": concurrency, "requests": per_conn * concurrency,
+            "completed": len(values), "errors": errors[0],
+            "p50_ms": ms(percentile(values, 50)), "p95_ms": ms(percentile(values, 95)),
+            "p99_ms": ms(percentile(values, 99)), "max_ms": ms(values[-1]) if values else 0.0,
+            "throughput_rps": round(len(values) / wall, 1)}
+
+
+async def bench_mode(mode, port, args, ctx, tokens, admin_token):
+    results = []
+    for listeners in args.listener_counts:
+        writers, connected = await open_listeners(port, listeners, admin_token) if listeners else ([], 0)
+        try:
+            for name in args.names:
+                await run_load(port, name, 4, args.warmup, tokens, ctx, args.seed, args.timeout, args.duration)
+                for concurrency in args.concurrency_levels:
+                    r = await run_load(port, name, concurrency, args.requests, tokens, ctx, args.seed,
+                                       args.timeout, args.duration)
+                    r.update(mode=mode, listeners=listeners, listeners_connected=connected)
+                    results.append(r)
+                    print_row(r)
+        finally:
+            for w in writers:
+                w.close()
+    return results
+
+
+COLUMNS = ["mode", "scenario", "listeners", "listeners_connected", "concurrency", "completed", "errors", "p50_ms", "p99_ms", "throughput_rps"]
+
+
+def print_row(r):
+    print("  ".join(f"{str(r[c]):>14}" for c in COLUMNS), flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.serving", description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", default="wsgi,asgi", help="comma-separated subset of wsgi,asgi")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--years", type=float, default=1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=32, help="handler threads per server (default: %(default)s)")
+    parser.add_argument("--concurrency", default="16,256", help="comma-separated client connection counts")
+    parser.add_argument("--listeners", default="0,200", help="comma-separated open event-stream counts")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario and level")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=10, help="seconds before a request counts as failed")
+    parser.add_argument("--duration", type=float, default=30, help="seconds before a level stops issuing requests")
+    parser.add_argument("--scenarios", default="summary,attendance_post")
+    parser.add_argument("--out", type=Path, default=Path("serving-results.json"))
+    args = parser.parse_args(argv)
+    args.names = [n for n in args.scenarios.split(",") if n]
+    unknown = set(args.names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    args.concurrency_levels = [int(c) for c in args.concurrency.split(",")]
+    args.listener_counts = [int(n) for n in args.listeners.split(",")]
+
+    with tempfile.TemporaryDirectory(prefix="attendance-serving-") as tmp:
+        workdir = Path(tmp)
+        app = load_app(workdir, "json")
+        end = date.today()
+        datagen.populate(app.store, args.users, args.years, args.seed, end,
+                         password_hash=app.hash_password(datagen.PASSWORD))
+        ctx = {"cycles": data_cycles(end, args.years)}
+        tokens = [app.create_jwt({"sub": datagen.username(k)}) for k in range(min(args.users, 256))]
+        admin_token = app.create_jwt({"sub": datagen.ADMIN_USER})
+
+        print("  ".join(f"{c:>14}" for c in COLUMNS))
+        results = []
+        for mode in args.modes.split(","):
+            proc, port = start_server(mode, workdir, args.threads)
+            try:
+                results += asyncio.run(bench_mode(mode, port, args, ctx, tokens, admin_token))
+            finally:
+                proc.terminate()
+                proc.wait()
+
+    report = {"meta": {"commit": git_commit(), "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                       "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+                       "users": args.users, "years": args.years, "threads": args.threads,
+                       "requests": args.requests, "timeout": args.timeout, "duration": args.duration},
+              "results": results}
+    args.out.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"results written to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# app.py reads its configuration at import time: point every file it may
+# touch at a scratch directory and use a cheap password hash
+_scratch = Path(tempfile.mkdtemp(prefix="attendance-tests-"))
+os.environ.update(
+    ATTENDANCE_DATA_FILE=str(_scratch / "attendance.json"),
+    ATTENDANCE_SQLITE_FILE=str(_scratch / "attendance.db"),
+    ATTENDANCE_SHARD_DIR=str(_scratch / "shards"),
+    PASSWORD_HASH_METHOD="pbkdf2:sha256:1000",
+)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "api"))
+
+import app as attendance  # noqa: E402
+
+REC = {"shift": "FS", "status": "Present", "ot_hours": 1.5}
+
+STORES = {
+    "json": lambda d: attendance.JSONStore(d / "attendance.json"),
+    "log": lambda d: attendance.LogStore(d / "attendance.json"),
+    "sqlite": lambda d: attendance.SQLiteStore(d / "attendance.db"),
+    "sharded": lambda d: attendance.ShardedStore(d / "shards", 4),
+}
+
+
+@pytest.fixture(params=list(STORES))
+def backend(request):
+    return request.param
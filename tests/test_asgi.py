@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+import pytest
+
+from conftest import attendance
+
+
+@pytest.fixture
+def admin_token(tmp_path, monkeypatch):
+    st = attendance.JSONStore(tmp_path / "attendance.json")
+    users = [("admin", {"name": "Admin", "password": "x", "is_admin": True})]
+    users += [("user%05d" % k, {"name": "User %d" % k, "password": "x"}) for k in range(5000)]
+    st._commit([{"op": "put_user", "user": u, "value": dict(obj, attendance={})} for u, obj in users])
+    monkeypatch.setattr(attendance, "store", attendance.TimedStore(lambda: st))
+    return attendance.create_jwt({"sub": "admin"})
+
+
+async def asgi_get(asgi, path, query, token):
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": query.encode(),
+             "headers": [(b"authorization", ("Bearer " + token).encode())],
+             "client": ("127.0.0.1", 40000), "server": ("testserver", 80)}
+    requested, sent = False, []
+
+    async def receive():
+        nonlocal requested
+        if requested:
+            await asyncio.Event().wait()
+        requested = True
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+        await asyncio.sleep(0)  # let other responses take the executor threads
+
+    await asgi(scope, receive, send)
+    return sent
+
+
+def test_streamed_body_spanning_many_pulls(admin_token):
+    asgi = attendance.AsgiApp(attendance.app, 8)
+
+    async def main():
+        return await asyncio.gather(*(asgi_get(asgi, "/api/admin/users", "format=ndjson", admin_token)
+                                      for _ in range(4)))
+
+    try:
+        responses = asyncio.run(main())
+    finally:
+        asgi.executor.shutdown()
+    for sent in responses:
+        assert sent[0]["status"] == 200
+        body = b"".join(m.get("body", b"") for m in sent[1:])
+        assert not sent[-1].get("more_body")
+        assert len(body) > 4 * attendance.EXPORT_CHUNK
+        lines = [json.loads(line) for line in body.decode().splitlines()]
+        assert len(lines) == 5001 and lines[-1]["username"] == "user04999"
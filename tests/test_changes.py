@@ -0,0 +1,103 @@
+import pytest
+
+from conftest import REC, attendance
+
+CHANGED = {
+    "json": lambda d: attendance.JSONStore(d / "attendance.json", changes=True),
+    "log": lambda d: attendance.LogStore(d / "attendance.json", changes=True),
+    "sqlite": lambda d: attendance.SQLiteStore(d / "attendance.db", changes=True),
+    "sharded": lambda d: attendance.ShardedStore(d / "shards", 4, changes=True),
+}
+
+
+@pytest.fixture(params=list(CHANGED))
+def logged(request, tmp_path):
+    return lambda: CHANGED[request.param](tmp_path)
+
+
+def add_user(st, username):
+    st.put_user(username, {"name": username.title(), "password": "x", "attendance": {}})
+
+
+def test_writes_of_every_worker_are_logged_once_per_record(logged):
+    a, b = logged(), logged()
+    add_user(a, "bob")
+    add_user(a, "cy")
+    start = a.change_rev()
+    a.put_day("bob", "2026-10-01", REC)
+    b.put_day("bob", "2026-10-02", REC)
+    b.put_day("bob", "2026-10-01", dict(REC, shift="SS"))
+    a.delete_day("bob", "2026-10-02")
+    a.delete_day("bob", "2026-10-03")  # nothing there: not a change
+    b.put_day("cy", "2026-10-01", REC)
+
+    horizon, latest, rows, more = logged().changes_since(start, "bob")
+    assert not more and horizon <= start < latest
+    assert [(day, deleted) for _, _, day, deleted in rows] == [("2026-10-01", False), ("2026-10-02", True)]
+    assert rows == sorted(rows) and rows[-1][0] <= latest
+    assert logged().user_rev("bob") == rows[-1][0]  # the store's own commit rev
+
+    _, _, everyone, _ = a.changes_since(start)
+    assert {(user, day) for _, user, day, _ in everyone} == {
+        ("bob", "2026-10-01"), ("bob", "2026-10-02"), ("cy", "2026-10-01")}
+    assert a.changes_since(latest)[2] == []
+
+    b.delete_user("bob")
+    _, _, rows, _ = a.changes_since(latest, "bob")
+    assert [(day, deleted) for _, _, day, deleted in rows] == [(None, True)]
+
+
+def test_pages_never_split_a_commit(logged):
+    st = logged()
+    add_user(st, "bob")
+    start = st.change_rev()
+    st.put_days([("bob", "2026-09-%02d" % d, REC) for d in range(1, 6)])
+    st.put_day("bob", "2026-10-01", REC)
+
+    _, _, rows, more = st.changes_since(start, limit=3)
+    assert more and len(rows) == 5 and len({rev for rev, *_ in rows}) == 1
+    _, _, rest, more = st.changes_since(rows[-1][0], limit=3)
+    assert not more and [day for _, _, day, _ in rest] == ["2026-10-01"]
+
+
+def test_failed_sqlite_commit_logs_nothing(tmp_path):
+    st = CHANGED["sqlite"](tmp_path)
+    add_user(st, "bob")
+    start = st.change_rev()
+    with pytest.raises(Exception):
+        st._commit([{"op": "put_day", "user": "bob", "day": "2026-10-01", "value": REC},
+                    {"op": "put_day", "user": "bob", "day": "2026-10-02", "value": None}])
+    assert st.get_day("bob", "2026-10-01") is None
+    assert st.changes_since(start)[2] == []
+
+
+def test_archiving_is_not_a_deletion(logged, tmp_path):
+    st = attendance.ArchivedStore(logged(), tmp_path / "archive")
+    add_user(st, "bob")
+    st.put_day("bob", "2024-03-06", REC)
+    start = st.change_rev()
+    st.archive((2025, 6))
+    assert st.changes_since(start)[2] == []
+    assert st.get_day("bob", "2024-03-06") == REC
+
+
+def test_trimmed_log_sends_readers_back_to_a_reload(tmp_path):
+    st = CHANGED["json"](tmp_path)
+    add_user(st, "bob")
+    st.put_day("bob", "2026-10-01", REC)
+    st.changes.keep_days = -1
+    with st.changes._conn() as conn:
+        st.changes.trim(conn)
+    horizon, latest, rows, _ = st.changes_since(0)
+    assert rows == [] and 0 < horizon < latest
+
+
+@pytest.mark.parametrize("enabled", [False, True])
+def test_changes_endpoint_is_opt_in(tmp_path, monkeypatch, enabled):
+    st = CHANGED["json"](tmp_path)
+    add_user(st, "bob")
+    monkeypatch.setattr(attendance, "store", attendance.TimedStore(lambda: st))
+    monkeypatch.setattr(attendance, "CHANGES_LOG", enabled)
+    headers = {"Authorization": "Bearer " + attendance.create_jwt({"sub": "bob"})}
+    resp = attendance.app.test_client().get("/api/changes?since=0", headers=headers)
+    assert resp.status_code == (200 if enabled else 404)
@@ -0,0 +1,16 @@
+import csv
+import io
+
+from conftest import attendance
+
+
+def test_csv_cells_that_spreadsheets_would_evaluate_are_quoted():
+    rows = [["eve", "=HYPERLINK(\"http://x\",\"y\")", 1, 0, 1.5, "", "", "", "", ""],
+            ["mal", "+1+1", 0, 0, 0.0, "", "", "", "", "-2"],
+            ["amy", "@SUM(A1)", 0, 0, 0.0, "", "", "", "", "\t=1"],
+            ["bob", "Bob - FS", 2, 1, 0.0, "1 2", "", "", "", "FS: 1, 2"]]
+    parsed = list(csv.reader(io.StringIO("".join(attendance.csv_stream(rows)))))
+    assert parsed[0] == attendance.EXPORT_COLUMNS
+    assert [r[1] for r in parsed[1:]] == ["'=HYPERLINK(\"http://x\",\"y\")", "'+1+1", "'@SUM(A1)", "Bob - FS"]
+    assert parsed[2][9] == "'-2" and parsed[3][9] == "'\t=1"
+    assert parsed[1][2:5] == ["1", "0", "1.5"]
@@ -0,0 +1,170 @@
+import threading
+
+import pytest
+
+from conftest import REC, STORES, attendance
+
+
+@pytest.fixture
+def app_store(backend, tmp_path, monkeypatch):
+    st = STORES[backend](tmp_path)
+    monkeypatch.setattr(attendance, "store", attendance.TimedStore(lambda: st))
+    monkeypatch.setattr(attendance, "login_ip_limiter", attendance.RateLimiter(1000, 1))
+    monkeypatch.setattr(attendance, "login_user_limiter", attendance.RateLimiter(1000, 1))
+    return st
+
+
+def login(name, user, admin=False):
+    client = attendance.app.test_client()
+    assert client.post("/api/register", json={"name": name, "user": user, "pass": "pw", "admin": admin}).status_code == 200
+    assert client.post("/api/login", json={"user": user, "pass": "pw"}).status_code == 200
+    return client
+
+
+def test_attendance_flow(app_store):
+    bo = login("Bo", "bo")
+    assert bo.post("/attendance", json={"date": "2026-10-01", "shift": "FS", "status": "Present",
+                                        "ot_hours": 2}).status_code == 200
+    assert bo.post("/attendance", json={"date": "2026-10-02", "shift": "GEN", "status": "Absent"}).status_code == 200
+    assert bo.get("/attendance/2026-10-01").get_json() == {"shift": "FS", "status": "Present", "ot_hours": 2.0}
+
+    summary = bo.get("/summary?year=2026&month=10").get_json()
+    assert (summary["present"], summary["absent"], summary["ot_hours"]) == (1, 1, 2.0)
+    calendar = bo.get("/api/calendar?year=2026&month=10")
+    assert calendar.status_code == 200
+    assert bo.get("/api/calendar?year=2026&month=10",
+                  headers={"If-None-Match": calendar.headers["ETag"]}).status_code == 304
+
+    assert bo.delete("/attendance/2026-10-02").status_code == 200
+    assert bo.delete("/attendance/2026-10-02").status_code == 404
+    bulk = bo.post("/attendance/bulk", json={"entries": [
+        {"date": "2026-10-03", "shift": "SS", "status": "Present", "ot_hours": 1.5},
+        {"date": "bad", "status": "Present"}]}).get_json()
+    assert bulk["saved"] == 1 and not bulk["results"][1]["ok"]
+    assert app_store.attendance("bo") == {"2026-10-01": {"shift": "FS", "status": "Present", "ot_hours": 2.0},
+                                          "2026-10-03": {"shift": "SS", "status": "Present", "ot_hours": 1.5}}
+    assert bo.get("/").status_code == 200
+    assert bo.get("/admin").status_code == 403
+
+
+def test_admin_flow(app_store):
+    al = login("Al", "al", admin=True)
+    login("Bo", "bo")
+    saved = al.post("/api/admin/attendance/bulk", json=[
+        {"username": "bo", "date": "2026-10-05", "status": "Present", "shift": "NS"},
+        {"username": "zz", "date": "2026-10-05", "status": "Present"},
+        {"username": ["bo"], "date": "2026-10-06", "status": "Present"},
+        {"username": {"u": "bo"}, "date": "2026-10-06", "status": "Present"}]).get_json()
+    assert saved["saved"] == 1
+    assert [r.get("error") for r in saved["results"][1:]] == ["Unknown username"] * 3
+
+    users = al.get("/api/admin/users").get_json()["users"]
+    assert [u["username"] for u in users] == ["al", "bo"]
+    bo = al.get("/api/admin/user/bo").get_json()
+    assert "password" not in bo and list(bo["attendance"]) == ["2026-10-05"]
+    assert al.get("/api/admin/headcount?date=2026-10-05").get_json()["present"] == 1
+    report = al.get("/api/admin/report?year=2026&month=10").get_json()
+    assert report["users"] == 2 and report["present"] == 1
+    export = al.get("/api/admin/export?year=2026&month=10")
+    assert export.status_code == 200 and export.data.decode().splitlines()[2].startswith("bo,Bo,1,0")
+
+    assert al.post("/api/forgot", json={"user": "bo"}).status_code == 200
+    assert app_store.get_day("bo", "2026-10-05") is not None
+    assert al.delete("/api/admin/user/bo").status_code == 200
+    assert al.get("/api/admin/user/bo").status_code == 404
+    assert [u["username"] for u in al.get("/api/admin/users").get_json()["users"]] == ["al"]
+
+
+def test_routes_refuse_anonymous_and_unknown_users(app_store):
+    anonymous = attendance.app.test_client()
+    assert anonymous.get("/summary").status_code == 401
+    assert anonymous.get("/api/admin/users").status_code == 401
+    login("Bo", "bo")
+    wrong = attendance.app.test_client().post("/api/login", json={"user": "bo", "pass": "nope"})
+    assert wrong.status_code == 401
+
+
+def test_concurrent_writes_through_two_stores(tmp_path, backend):
+    # two store objects on the same files stand in for two workers, each
+    # serving several threads; no write may be lost
+    a, b = STORES[backend](tmp_path), STORES[backend](tmp_path)
+    users = ["u%d" % k for k in range(8)]
+    for u in users:
+        a.put_user(u, {"name": u, "password": "x", "attendance": {}})
+
+    def write(st, u):
+        for d in range(1, 21):
+            assert st.put_day(u, "2026-09-%02d" % d, REC)
+
+    threads = [threading.Thread(target=write, args=((a, b)[k % 2], u)) for k, u in enumerate(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for st in (a, b, STORES[backend](tmp_path)):
+        for u in users:
+            assert len(st.attendance(u)) == 20
+            assert st.cycle_totals(u, 2026, 9)["present"] == 20
+
+
+def test_single_save_normalises_or_rejects_the_date(app_store):
+    bo = login("Bo", "bo")
+    assert bo.post("/attendance", json={"date": "2026-01-06", "shift": "FS", "status": "Present"}).status_code == 200
+    assert bo.get("/summary?year=2026&month=1").get_json()["present"] == 1  # totals now cached
+    for day in ("20260105", "2026-W02-1"):  # both are 2026-01-05 to fromisoformat
+        assert bo.post("/attendance", json={"date": day, "shift": "FS", "status": "Present"}).status_code == 200
+    for day in ("2026-13-01", "yesterday", ["2026-01-05"]):
+        assert bo.post("/attendance", json={"date": day, "status": "Present"}).status_code == 400
+    assert sorted(app_store.attendance("bo")) == ["2026-01-05", "2026-01-06"]
+    summary = bo.get("/summary?year=2026&month=1").get_json()
+    assert summary["present"] == 2 and "-1" not in summary["shift_line"]
+    assert app_store.cycle_totals("bo", 2026, 1) == app_store.cycle_totals("bo", 2026, 1, cache=False)
+
+
+def test_admin_stats_follow_writes(app_store, monkeypatch):
+    pytest.importorskip("numpy")
+    monkeypatch.setattr(attendance, "_columns_cache", attendance.OrderedDict())
+    al = login("Al", "al", admin=True)
+    bo = login("Bo", "bo")
+    assert bo.post("/attendance", json={"date": "2026-10-01", "shift": "FS", "status": "Present",
+                                        "ot_hours": 2}).status_code == 200
+    stats = al.get("/api/admin/stats?year=2026&month=10").get_json()
+    assert stats["records"] == 1 and stats["shifts"]["FS"] == {"days": 1, "ot_hours": 2.0}
+    # a record the packed arrays can't hold (extra field, int OT) and a
+    # shift-less one, which counts as GEN
+    app_store.put_day("bo", "2026-10-02", {"shift": "SS", "status": "Present", "ot_hours": 1, "note": "x"})
+    app_store.put_day("al", "2026-10-02", {"shift": None, "status": "Present", "ot_hours": 0.5})
+    stats = al.get("/api/admin/stats?year=2026&month=10").get_json()
+    assert stats["records"] == 3
+    assert {k: v["days"] for k, v in stats["shifts"].items() if v["days"]} == {"GEN": 1, "FS": 1, "SS": 1}
+    assert stats["top_ot"] == [{"username": "bo", "ot_hours": 3.0}, {"username": "al", "ot_hours": 0.5}]
+    assert [d["present"] for d in stats["daily_headcount"] if d["date"] in ("2026-10-01", "2026-10-02")] == [1, 2]
+
+
+def test_overlapping_profiled_requests(tmp_path, monkeypatch):
+    # cProfile can't be enabled twice at once on 3.12+: the request that
+    # overlaps a profiled one is served unprofiled instead of failing
+    monkeypatch.setattr(attendance, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(attendance, "PROFILE_RATE", 1.0)
+    started, results = threading.Barrier(2), []
+
+    def serve(wait=True):
+        with attendance.app.test_request_context("/login"):
+            attendance._start_profile()
+            if wait:
+                started.wait()
+            profiled = "profile" in attendance.g
+            resp = attendance._save_profile(attendance.app.response_class("ok"))
+            attendance._stop_profile(None)
+            results.append((profiled, resp.headers.get("X-Profile-Id")))
+
+    threads = [threading.Thread(target=serve) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(p for p, _ in results) == [False, True]
+    assert [bool(name) for p, name in results] == [p for p, _ in results]
+    serve(wait=False)  # the lock was released
+    assert results[-1][0]
+    assert all((tmp_path / f"{name}.pstats").is_file() for _, name in results if name)
@@ -0,0 +1,52 @@
+from conftest import REC, STORES, attendance
+
+
+def test_field_update_keeps_records_saved_by_another_worker(tmp_path, backend):
+    # two store objects on the same files stand in for two workers
+    a, b = STORES[backend](tmp_path), STORES[backend](tmp_path)
+    a.put_user("bob", {"name": "Bob", "password": "old", "is_admin": False, "attendance": {}})
+    assert a.get_user("bob")  # a now holds bob with no records
+    assert b.put_day("bob", "2026-10-01", REC)
+
+    assert a.update_user("bob", reset_token={"token": "t", "exp": 1})
+    for st in (a, b, STORES[backend](tmp_path)):
+        assert st.attendance("bob") == {"2026-10-01": REC}
+        assert st.get_user("bob")["reset_token"] == {"token": "t", "exp": 1}
+
+    assert b.update_user("bob", password="new", reset_token=None)
+    user = a.get_user("bob")
+    assert user["password"] == "new" and "reset_token" not in user and user["name"] == "Bob"
+    assert a.attendance("bob") == {"2026-10-01": REC}
+
+
+def test_update_user_of_unknown_user(tmp_path, backend):
+    st = STORES[backend](tmp_path)
+    assert st.update_user("nobody", password="x") is False
+    assert not st.has_user("nobody")
+
+
+def test_log_appends_stay_small_for_long_histories(tmp_path):
+    st = STORES["log"](tmp_path)
+    history = {"2024-%02d-%02d" % (m, d): REC for m in range(1, 13) for d in range(1, 26)}
+    st.put_user("bob", {"name": "Bob", "password": "x", "attendance": history})
+    log = st.log_path
+    for write in (lambda: st.put_day("bob", "2026-10-01", REC),
+                  lambda: st.update_user("bob", reset_token={"token": "t" * 200, "exp": 1}),
+                  lambda: st.delete_day("bob", "2026-10-01")):
+        before = log.stat().st_size if log.exists() else 0
+        write()
+        assert log.stat().st_size - before < 512
+    assert len(st.attendance("bob")) == len(history)
+
+
+def test_archive_leaves_legacy_day_keys_hot(tmp_path, backend):
+    hot = STORES[backend](tmp_path)
+    st = attendance.ArchivedStore(hot, tmp_path / "archive")
+    st.put_user("bob", {"name": "Bob", "password": "x", "attendance": {}})
+    st.put_days([("bob", "2024-03-06", REC), ("bob", "2020-3-6", REC), ("bob", "2026-10-01", REC)])
+
+    assert st.archive((2025, 6)) == (1, 1)
+    assert st._read_state() == ((2025, 6), None)
+    assert hot.attendance("bob") == {"2020-3-6": REC, "2026-10-01": REC}
+    assert st.attendance("bob") == {"2020-3-6": REC, "2024-03-06": REC, "2026-10-01": REC}
+    assert st.archive((2025, 6)) == (0, 0)
@@ -0,0 +1,33 @@
+import pytest
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from conftest import attendance
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = attendance.RateLimiter(3, 60)
+    monkeypatch.setattr(attendance, "login_ip_limiter", limiter)
+    return limiter
+
+
+def failed_logins(client, n, forwarded=None):
+    statuses = []
+    for i in range(n):
+        headers = {"X-Forwarded-For": forwarded(i)} if forwarded else {}
+        statuses.append(client.post("/api/login", json={"user": "nobody%d" % i, "pass": "x"},
+                                    headers=headers).status_code)
+    return statuses
+
+
+def test_forwarded_for_is_ignored_without_a_proxy(limiter):
+    client = attendance.app.test_client()
+    statuses = failed_logins(client, 6, forwarded=lambda i: "10.0.0.%d" % i)
+    assert statuses.count(429) == 3
+
+
+def test_forwarded_for_is_used_behind_a_configured_proxy(limiter, monkeypatch):
+    monkeypatch.setattr(attendance.app, "wsgi_app", ProxyFix(attendance.app.wsgi_app, x_for=1))
+    client = attendance.app.test_client()
+    assert 429 not in failed_logins(client, 6, forwarded=lambda i: "10.0.0.%d" % i)
+    assert failed_logins(client, 4, forwarded=lambda i: "10.0.1.1").count(429) == 1